@@ -0,0 +1,63 @@
+"""
+Compares two benchmarks.suite result files.
+
+    python -m benchmarks.compare baseline.json candidate.json [--threshold 1.1]
+
+Prints the best time of each benchmark in both runs and the ratio
+candidate / baseline, marking ratios above the threshold as regressions.
+Exits with status 1 if any benchmark regressed.
+"""
+import argparse
+import json
+import sys
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+def compare(baseline, candidate, threshold=1.1):
+    """
+    Returns a list of (name, baseline seconds, candidate seconds, ratio)
+    for benchmarks present in both runs, and the names of regressions.
+    """
+    rows = []
+    regressions = []
+    for name, timing in candidate["results"].items():
+        if name not in baseline["results"]:
+            continue
+        before = baseline["results"][name]["best"]
+        after = timing["best"]
+        ratio = after / before if before > 0 else float("inf")
+        rows.append((name, before, after, ratio))
+        if ratio > threshold:
+            regressions.append(name)
+    return rows, regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=1.1)
+    args = parser.parse_args()
+
+    baseline, candidate = load(args.baseline), load(args.candidate)
+    for document in (baseline, candidate):
+        meta = document["meta"]
+        print(f"{meta.get('commit')}: {meta['stations']} stations, {meta.get('rows', 0)} rows")
+    if (baseline["meta"]["stations"], baseline["meta"]["years"]) != (candidate["meta"]["stations"], candidate["meta"]["years"]):
+        print("Warning: runs used different data sizes")
+
+    rows, regressions = compare(baseline, candidate, args.threshold)
+    print("-"*84)
+    print(f" {'benchmark':<50}{'baseline':>10}{'candidate':>11}{'ratio':>8}")
+    print("-"*84)
+    for name, before, after, ratio in rows:
+        flag = "  <<" if name in regressions else ""
+        print(f" {name:<50}{before * 1000:8.2f}ms{after * 1000:9.2f}ms{ratio:7.2f}x{flag}")
+
+    missing = sorted(set(baseline["results"]) ^ set(candidate["results"]))
+    if missing:
+        print(f"Only in one run: {', '.join(missing)}")
+    if regressions:
+        print(f"{len(regressions)} regression(s) above {args.threshold}x")
+        sys.exit(1)
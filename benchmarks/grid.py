@@ -0,0 +1,53 @@
+"""
+Climate map grid build time at several resolutions.
+
+    python -m benchmarks.grid [--stations N] [--seed N] [--repeats N]
+                              [--resolutions 0.5 0.25 0.1 0.05]
+
+Interpolates values at N synthetic station locations onto the UK grid with
+spatial.idw_grid(), as climate_grid() does on a cache miss, and prints the
+best build time and grid size for each resolution.
+"""
+import argparse
+
+import numpy as np
+
+import src.spatial as spatial
+from benchmarks import synthetic
+from benchmarks.suite import time_call
+
+RESOLUTIONS = (0.5, 0.25, 0.1, 0.05)
+
+def run(station_count, resolutions=RESOLUTIONS, seed=0, repeats=3):
+    """
+    Returns {resolution: timing dict with points and stations}.
+    """
+    stations = synthetic.make_stations(station_count, 1, seed)
+    lats = np.array([station[2] for station in stations])
+    lons = np.array([station[1] for station in stations])
+    values = 10 - 0.5 * (lats - 52) + np.random.default_rng(seed).normal(0, 0.5, len(stations))
+
+    results = {}
+    for resolution in resolutions:
+        timing, (grid_lats, grid_lons, _) = time_call(
+            lambda: spatial.idw_grid(lats, lons, values, resolution=resolution), repeats)
+        timing["points"] = len(grid_lats) * len(grid_lons)
+        timing["stations"] = station_count
+        results[resolution] = timing
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark climate map grid builds.")
+    parser.add_argument("--stations", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--resolutions", type=float, nargs="+", default=RESOLUTIONS)
+    args = parser.parse_args()
+
+    results = run(args.stations, args.resolutions, args.seed, args.repeats)
+
+    print("-"*60)
+    print(f"{args.stations} stations (best of {args.repeats})")
+    print("-"*60)
+    for resolution, timing in results.items():
+        print(f" {resolution:6.2f}°{timing['points']:9d} points{timing['best'] * 1000:10.1f}ms")
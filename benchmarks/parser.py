@@ -0,0 +1,75 @@
+"""
+Compares the vectorized station-file parser with the original
+read_csv + clean_number path over every station file.
+
+    python -m benchmarks.parser [station_file_dir]
+
+Station files are read from station_file_dir (*.txt) if given,
+otherwise downloaded from the Met Office site.
+"""
+import os
+import sys
+import time
+
+import src.scraper as scraper
+
+REPEATS = 3
+
+def load_station_texts(directory=None):
+    if directory:
+        texts = {}
+        for file_name in sorted(os.listdir(directory)):
+            if file_name.endswith(".txt"):
+                with open(os.path.join(directory, file_name)) as f:
+                    texts[file_name] = f.read()
+        return texts
+
+    _, stations = scraper.extract_historic_station_table_data()
+    texts = {}
+    for station in stations:
+        text = scraper.get_text(station[3])
+        if text is not None:
+            texts[station[0]] = text
+    return texts
+
+def legacy_parse(text):
+    result = scraper.parse_station_text(text)
+    if result is None:
+        return []
+    df, _ = result
+    return scraper.clean_observations(df)
+
+def vectorized_parse(text):
+    df = scraper.parse_station_columns(text)
+    if df is None:
+        return []
+    return scraper.observation_rows(df)
+
+def time_parser(parse, texts):
+    """
+    Returns (best total seconds over REPEATS, rows parsed).
+    """
+    best = None
+    for _ in range(REPEATS):
+        rows = 0
+        start = time.perf_counter()
+        for text in texts.values():
+            rows += len(parse(text))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, rows
+
+if __name__ == "__main__":
+    texts = load_station_texts(sys.argv[1] if len(sys.argv) > 1 else None)
+
+    print("-"*60)
+    print(f"Parsing {len(texts)} station files (best of {REPEATS})")
+    print("-"*60)
+
+    results = {}
+    for label, parse in (("legacy", legacy_parse), ("vectorized", vectorized_parse)):
+        elapsed, rows = time_parser(parse, texts)
+        results[label] = elapsed
+        print(f" {label:<12}{elapsed:8.3f}s  {rows} rows  ({rows / elapsed:.0f} rows/s)")
+
+    print(f" speedup     {results['legacy'] / results['vectorized']:8.1f}x")
@@ -0,0 +1,89 @@
+"""
+Station graph render throughput, with and without chart templates.
+
+    python -m benchmarks.render [--stations N] [--years N] [--seed N]
+                                [--format png|svg|webp] [--repeats N]
+
+Builds a synthetic database in a temporary directory, fetches every
+station's series up front, then draws and encodes every station graph for
+every station: once drawing each figure from scratch, as before templates,
+and once reusing each chart's template figure. Prints renders/sec for both.
+"""
+import argparse
+import os
+import tempfile
+
+import src.database as db
+import src.analysis as analysis
+from benchmarks import synthetic
+from benchmarks.suite import time_call
+
+def render_stations(series, fmt):
+    """
+    Draws and encodes every station graph. Returns the number rendered.
+    """
+    renders = 0
+    for station_id, frames in series.items():
+        for graph, df in frames.items():
+            fig = analysis.chart_figure("station", graph, station_id, df=df)
+            analysis.figure_bytes(fig, fmt)
+            renders += 1
+    return renders
+
+def run(station_count, years, seed=0, fmt="png", repeats=1):
+    """
+    Returns {mode: timing dict with renders and renders_per_second}.
+    """
+    stations = synthetic.make_stations(station_count, years, seed)
+    texts = synthetic.generate_texts(stations, seed)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        database_name = db.DATABASE_NAME
+        db.close_connections()
+        db.DATABASE_NAME = os.path.join(directory, "benchmark.db")
+        analysis.invalidate_station_registry()
+        templates = analysis.CHART_TEMPLATES
+        try:
+            corpus = os.path.join(directory, "corpus")
+            synthetic.write_corpus(corpus, stations, texts)
+            synthetic.build_database(stations, corpus)
+            series = {}
+            for station_id, in db.select("SELECT id FROM stations ORDER BY id;", name="benchmark.stations"):
+                series[station_id] = {
+                    graph: spec.series(station_id)
+                    for graph, spec in analysis.CHARTS["station"].items()
+                }
+
+            for mode, enabled in (("fresh", False), ("template", True)):
+                analysis.CHART_TEMPLATES = enabled
+                timing, renders = time_call(lambda: render_stations(series, fmt), repeats)
+                timing["renders"] = renders
+                timing["renders_per_second"] = renders / timing["best"]
+                results[mode] = timing
+        finally:
+            analysis.CHART_TEMPLATES = templates
+            analysis.invalidate_station_registry()
+            db.close_connections()
+            db.DATABASE_NAME = database_name
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark station graph renders/sec with and without chart templates.")
+    parser.add_argument("--stations", type=int, default=100)
+    parser.add_argument("--years", type=int, default=150)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", choices=analysis.IMAGE_FORMATS, default="png")
+    parser.add_argument("--repeats", type=int, default=1)
+    args = parser.parse_args()
+
+    results = run(args.stations, args.years, args.seed, args.format, args.repeats)
+
+    print("-"*60)
+    print(f"{args.stations} stations, {args.format} (best of {args.repeats})")
+    print("-"*60)
+    for mode, timing in results.items():
+        print(f" {mode:<10}{timing['renders']:6d} renders in {timing['best']:7.2f}s"
+              f"{timing['renders_per_second']:9.1f}/s")
+    fresh, template = results["fresh"]["best"], results["template"]["best"]
+    print(f" speedup   {fresh / template:.2f}x")
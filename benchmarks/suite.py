@@ -0,0 +1,291 @@
+"""
+End-to-end benchmark over a synthetic database.
+
+    python -m benchmarks.suite [--preset small|medium|large]
+                               [--stations N] [--years N] [--seed N]
+                               [--repeats N] [--out results.json]
+
+Generates Met Office format station files for N stations with up to
+--years years of monthly records each, then times parsing, the scraper's
+streaming ingest of them as a replay corpus, every analysis query and plot
+function, and the main API endpoints.
+Everything runs in a temporary directory, so the real database and graphs
+are untouched. Results are written as JSON for benchmarks.compare.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import src.database as db
+import src.analysis as analysis
+import src.scraper as scraper
+from benchmarks import synthetic
+
+PRESETS = {
+    "small": (40, 150),
+    "medium": (500, 150),
+    "large": (5000, 150),
+}
+
+REPEATS = 3
+
+def time_call(function, repeats=REPEATS):
+    """
+    Runs function repeats times. Returns (timing dict, last result).
+    """
+    times = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return {
+        "best": min(times),
+        "median": statistics.median(times),
+        "repeats": repeats,
+    }, result
+
+def bench_parsing(texts, repeats):
+    results = {}
+
+    def legacy():
+        rows = 0
+        for text in texts.values():
+            df, _ = scraper.parse_station_text(text)
+            rows += len(scraper.clean_observations(df))
+        return rows
+
+    def vectorized():
+        rows = 0
+        for text in texts.values():
+            rows += len(scraper.observation_rows(scraper.parse_station_columns(text)))
+        return rows
+
+    for name, function in (("parse.legacy", legacy), ("parse.vectorized", vectorized)):
+        timing, rows = time_call(function, repeats)
+        timing["rows"] = rows
+        timing["rows_per_second"] = rows / timing["best"]
+        results[name] = timing
+    return results
+
+def bench_ingest(stations, corpus):
+    """
+    Times the scraper's streaming ingest of a replay corpus into a fresh
+    database, then a second replay of the unchanged corpus. Each is run
+    once, as the first leaves the database already up to date.
+    """
+    results = {}
+    for name in ("ingest", "ingest.unchanged"):
+        start = time.perf_counter()
+        rows = synthetic.build_database(stations, corpus)
+        elapsed = time.perf_counter() - start
+        results[name] = {
+            "best": elapsed,
+            "median": elapsed,
+            "repeats": 1,
+            "rows": rows,
+            "rows_per_second": rows / elapsed,
+            "stations_per_second": len(stations) / elapsed,
+        }
+    return results
+
+def bench_queries(station_ids, repeats):
+    """
+    Times every analysis query over a sample of stations, once against
+    the summary tables and once against the in-memory store.
+    """
+    station_queries = [
+        analysis.station_avg_rain,
+        analysis.station_avg_temp,
+        analysis.station_temp_trend_series,
+        analysis.station_monthly_series,
+    ]
+    overall_queries = [
+        analysis.overall_yearly_series,
+        analysis.overall_monthly_series,
+        analysis.latitude_series,
+        analysis.list_stations,
+    ]
+
+    results = {}
+    for backend, enabled in (("sql", False), ("store", True)):
+        analysis.use_store(enabled)
+        if enabled:
+            timing, _ = time_call(lambda: analysis.store.ObservationStore.load(), 1)
+            results["store.load"] = timing
+            analysis.store.get_store()
+
+        for query in station_queries:
+            timing, _ = time_call(lambda: [query(i) for i in station_ids], repeats)
+            timing["calls"] = len(station_ids)
+            results[f"query.{backend}.{query.__name__}"] = timing
+        for query in overall_queries:
+            timing, _ = time_call(query, repeats)
+            results[f"query.{backend}.{query.__name__}"] = timing
+
+    analysis.use_store(False)
+    for statistic in analysis.RANK_STATISTICS:
+        timing, _ = time_call(lambda: analysis.rank_stations("temp", statistic), repeats)
+        results[f"query.rank_stations.{statistic}"] = timing
+    timing, _ = time_call(
+        lambda: analysis.rank_stations("rain", "mean", start_year=1961, end_year=1990, months=(12, 1, 2)),
+        repeats)
+    results["query.rank_stations.window"] = timing
+    timing, _ = time_call(analysis.StationTrends.load, repeats)
+    results["query.station_trends"] = timing
+    return results
+
+def bench_plots(station_id, repeats):
+    """
+    Times every plot function with the render cache bypassed.
+    """
+    station_plots = [
+        analysis.plot_station_temp_trend,
+        analysis.plot_station_monthly_rainfall,
+        analysis.plot_station_monthly_sunshine,
+    ]
+    overall_plots = [
+        analysis.plot_overall_temp_trend,
+        analysis.plot_overall_monthly_temp,
+        analysis.plot_overall_rainfall_trend,
+        analysis.plot_overall_monthly_rainfall,
+        analysis.plot_overall_sunshine_trend,
+        analysis.plot_overall_monthly_sunshine,
+        analysis.plot_lat_against,
+    ]
+
+    results = {}
+    for plot in station_plots:
+        timing, _ = time_call(lambda: plot.__wrapped__(station_id), repeats)
+        results[f"plot.{plot.__name__}"] = timing
+    for plot in overall_plots:
+        timing, _ = time_call(plot.__wrapped__, repeats)
+        results[f"plot.{plot.__name__}"] = timing
+    return results
+
+def bench_api(station_id, repeats):
+    """
+    Times the API endpoints through a test client: the first (cold)
+    request renders, later (warm) requests are served from the cache.
+    """
+    try:
+        from fastapi.testclient import TestClient
+    except ImportError as e:
+        print(f"Skipping API benchmarks: {e}")
+        return {}
+
+    from src.api import app
+
+    endpoints = [
+        "/stations",
+        f"/station/{station_id}",
+        "/overall",
+        "/overall/latitude",
+        f"/data/station/{station_id}/temp_trend",
+        "/data/overall/trends",
+    ]
+
+    results = {}
+    analysis.render_cache.clear()
+    with TestClient(app) as client:
+        for endpoint in endpoints:
+            def get():
+                response = client.get(endpoint)
+                response.raise_for_status()
+                return response
+
+            timing, _ = time_call(get, 1)
+            results[f"api.cold.{endpoint}"] = timing
+            timing, _ = time_call(get, repeats)
+            results[f"api.warm.{endpoint}"] = timing
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(station_count, years, seed=0, repeats=REPEATS, sample=10):
+    """
+    Runs the whole suite. Returns the results document.
+    """
+    meta = {
+        "stations": station_count,
+        "years": years,
+        "seed": seed,
+        "repeats": repeats,
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "started": datetime.now(timezone.utc).isoformat(),
+    }
+    results = {}
+
+    stations = synthetic.make_stations(station_count, years, seed)
+    timing, texts = time_call(lambda: synthetic.generate_texts(stations, seed), 1)
+    meta["generate_seconds"] = timing["best"]
+    meta["bytes"] = sum(len(text) for text in texts.values())
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_name, graph_output_dir = db.DATABASE_NAME, analysis.GRAPH_OUTPUT_DIR
+        db.close_connections()
+        db.DATABASE_NAME = os.path.join(directory, "benchmark.db")
+        analysis.invalidate_station_registry()
+        analysis.GRAPH_OUTPUT_DIR = os.path.join(directory, "graphs")
+        os.makedirs(analysis.GRAPH_OUTPUT_DIR)
+        try:
+            results.update(bench_parsing(texts, repeats))
+            corpus = os.path.join(directory, "corpus")
+            synthetic.write_corpus(corpus, stations, texts)
+            results.update(bench_ingest(stations, corpus))
+            meta["rows"] = results["ingest"]["rows"]
+
+            station_ids = [row[0] for row in db.select("SELECT id FROM stations ORDER BY id;", name="benchmark.stations")]
+            step = max(1, len(station_ids) // sample)
+            sampled = station_ids[::step][:sample]
+
+            results.update(bench_queries(sampled, repeats))
+            results.update(bench_plots(sampled[0], repeats))
+            results.update(bench_api(sampled[0], repeats))
+        finally:
+            analysis.shutdown_render_pool()
+            analysis.render_cache.clear()
+            analysis.use_store(False)
+            analysis.store.clear_store()
+            analysis.invalidate_station_registry()
+            db.close_connections()
+            db.DATABASE_NAME, analysis.GRAPH_OUTPUT_DIR = database_name, graph_output_dir
+
+    return {"meta": meta, "results": results}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard against synthetic station data.")
+    parser.add_argument("--preset", choices=PRESETS, default="small")
+    parser.add_argument("--stations", type=int, help="overrides the preset station count")
+    parser.add_argument("--years", type=int, help="overrides the preset years per station")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--out", default="benchmark_results.json")
+    args = parser.parse_args()
+
+    station_count, years = PRESETS[args.preset]
+    document = run(args.stations or station_count, args.years or years, args.seed, args.repeats)
+
+    with open(args.out, "w") as f:
+        json.dump(document, f, indent=2)
+
+    print("-"*72)
+    print(f"{document['meta']['stations']} stations, {document['meta'].get('rows', 0)} rows (best of {args.repeats})")
+    print("-"*72)
+    for name, timing in document["results"].items():
+        print(f" {name:<58}{timing['best'] * 1000:10.2f}ms")
+    print(f"Results written to {args.out}")
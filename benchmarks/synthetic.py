@@ -0,0 +1,183 @@
+"""
+Synthetic Met Office historic station data for benchmarks.
+
+Files follow the layout of the real station text files: a short preamble,
+the "yyyy mm tmax tmin af rain sun" header and units line, then one row per
+month with '---' for missing values, '*' for estimates, '#' for automatic
+sunshine readings and 'Provisional' notes, optionally ending in 'Site Closed'.
+
+    python -m benchmarks.synthetic DIR [--stations N] [--years N] [--seed N]
+
+writes a corpus that python -m src.scraper --replay DIR can ingest.
+"""
+import os
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+import src.scraper as scraper
+import src.database as db
+
+# Roughly the UK
+LAT_RANGE = (50.0, 58.5)
+LON_RANGE = (-6.0, 1.8)
+
+LAST_YEAR = 2024
+MISSING_RATE = 0.03
+ESTIMATED_RATE = 0.02
+CLOSED_RATE = 0.1
+
+def make_stations(count, years, seed=0):
+    """
+    Returns a list of (name, lon, lat, first_year, last_year, closed) for
+    count synthetic stations with up to years years of records each.
+    """
+    rng = np.random.default_rng(seed)
+    lats = rng.uniform(*LAT_RANGE, count)
+    lons = rng.uniform(*LON_RANGE, count)
+    spans = rng.integers(max(1, years * 2 // 3), years + 1, count)
+    closed = rng.random(count) < CLOSED_RATE
+
+    stations = []
+    for i in range(count):
+        last_year = LAST_YEAR - (int(rng.integers(1, 20)) if closed[i] else 0)
+        first_year = last_year - int(spans[i]) + 1
+        stations.append((
+            f"Synthetic{i:05d}", round(float(lons[i]), 3), round(float(lats[i]), 3),
+            first_year, last_year, bool(closed[i])))
+    return stations
+
+def station_text(name, lon, lat, first_year, last_year, closed=False, seed=0):
+    """
+    Returns the text of a station data file covering first_year to last_year.
+    """
+    rng = np.random.default_rng(seed)
+    years = np.repeat(np.arange(first_year, last_year + 1), 12)
+    months = np.tile(np.arange(1, 13), last_year - first_year + 1)
+    n = len(years)
+
+    # Seasonal cycle, cooler and wetter further north, slowly warming
+    season = np.cos((months - 7) / 12 * 2 * np.pi)
+    warming = (years - 1900) * 0.01
+    tmax = 13.5 + 6.5 * season - 0.4 * (lat - 52) + warming + rng.normal(0, 1.2, n)
+    tmin = tmax - 7.5 + rng.normal(0, 0.8, n)
+    af = np.clip(np.round(6 - 1.5 * tmin + rng.normal(0, 1.5, n)), 0, 31)
+    rain = np.clip(70 + 20 * (lat - 52) - 25 * season + rng.gamma(2, 20, n), 0, None)
+    sun = np.clip(110 + 90 * season - 4 * (lat - 52) + rng.normal(0, 20, n), 5, None)
+
+    columns = []
+    for fmt, values in (("%.1f", tmax), ("%.1f", tmin), ("%d", af), ("%.1f", rain), ("%.1f", sun)):
+        text = np.char.mod(fmt, values)
+        estimated = rng.random(n) < ESTIMATED_RATE
+        text = np.where(estimated, np.char.add(text, "*"), text)
+        missing = rng.random(n) < MISSING_RATE
+        text = np.where(missing, "---", text)
+        columns.append(np.char.rjust(text, 8))
+
+    # Automatic sunshine recorder from 2000
+    automatic = (years >= 2000) & (np.char.strip(columns[4]) != "---")
+    columns[4] = np.where(automatic, np.char.add(columns[4], "#"), columns[4])
+
+    rows = np.char.add(np.char.rjust(years.astype(str), 7), np.char.rjust(months.astype(str), 4))
+    for column in columns:
+        rows = np.char.add(rows, column)
+    if not closed:
+        rows[-3:] = np.char.add(rows[-3:], "  Provisional")
+
+    lines = [
+        name,
+        f"Location: Lat {lat:.3f} Lon {lon:.3f}, 100 metres amsl",
+        "Estimated data is marked with a * after the value.",
+        "Missing data (more than 2 days missing in month) is marked by  ---.",
+        "Sunshine data taken from an automatic Kipp & Zonen sensor marked with a #.",
+        "   yyyy  mm   tmax    tmin      af    rain     sun",
+        "              degC    degC    days      mm   hours",
+    ]
+    lines.extend(rows.tolist())
+    if closed:
+        lines.append("Site Closed")
+    return "\n".join(lines) + "\n"
+
+def index_html(stations, base_url):
+    """
+    Returns a historic station data index page listing the stations,
+    with data links under base_url.
+    """
+    rows = []
+    for name, lon, lat, first_year, _, _ in stations:
+        rows.append(
+            f"<tr><td>{name}</td><td>{lon}, {lat}</td><td>{first_year}</td>"
+            f"<td><a href=\"{base_url}/{file_name(name)}\">Data</a></td></tr>")
+    return (
+        "<html><body><table>"
+        "<thead><tr><th>Name</th><th>Location</th><th>Opened</th><th>Data</th></tr></thead>"
+        f"<tbody>{''.join(rows)}</tbody>"
+        "</table></body></html>\n")
+
+def file_name(station_name):
+    return f"{station_name.lower()}data.txt"
+
+def generate_texts(stations, seed=0):
+    """
+    Returns {station name: file text}.
+    """
+    return {
+        station[0]: station_text(*station, seed=seed + i)
+        for i, station in enumerate(stations)
+    }
+
+def write_corpus(directory, stations, texts, base_url="http://127.0.0.1:8000"):
+    """
+    Writes each station file, index.html and manifest.json to directory,
+    in the layout read by python -m src.scraper --replay.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for name, text in texts.items():
+        with open(os.path.join(directory, file_name(name)), "w") as f:
+            f.write(text)
+    manifest = {f"{base_url}/{file_name(name)}": file_name(name) for name in texts}
+    scraper.write_corpus_index(directory, index_html(stations, base_url), manifest)
+
+def build_database(stations, corpus):
+    """
+    Ingests a corpus written by write_corpus into the current database,
+    streaming each station file with scraper.stream_station_data as
+    python -m src.scraper --replay does. Files unchanged since a previous
+    build are skipped. Returns the number of observations written.
+    """
+    db.create_tables()
+    file_infos = db.get_station_files()
+    station_ids = {
+        name: db.insert_station(name, lon, lat, first_year, file_name(name))
+        for name, lon, lat, first_year, _, _ in stations
+    }
+
+    rows = 0
+    with ThreadPoolExecutor(max_workers=scraper.MAX_WORKERS) as pool:
+        futures = {
+            pool.submit(
+                scraper.stream_station_data, station_id,
+                os.path.join(corpus, file_name(name)), file_infos.get(station_id)): station_id
+            for name, station_id in station_ids.items()
+        }
+        for future in as_completed(futures):
+            result = future.result()
+            if result is None:
+                continue
+            inserted, file_info = result
+            db.set_station_file(futures[future], *file_info)
+            rows += inserted or 0
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic station data corpus.")
+    parser.add_argument("directory")
+    parser.add_argument("--stations", type=int, default=40)
+    parser.add_argument("--years", type=int, default=150)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    stations = make_stations(args.stations, args.years, args.seed)
+    write_corpus(args.directory, stations, generate_texts(stations, args.seed))
+    print(f"Wrote {len(stations)} stations to {args.directory}")
@@ -1,23 +1,347 @@
 import os
+import json
+import asyncio
+import hashlib
+import functools
+import threading
+import multiprocessing
+from io import BytesIO
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import src.database as db
+import src.store as store
+import src.spatial as spatial
+import src.anomalies as anomalies
+import src.metrics as metrics
 import pandas as pd
 import numpy as np
 
 import matplotlib
 matplotlib.use('Agg')  # Use non-interactive backend
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
     
 GRAPH_OUTPUT_DIR = "graphs"
 os.makedirs(GRAPH_OUTPUT_DIR, exist_ok=True)
 
+# Read graph data from the in-memory ObservationStore instead of SQL
+USE_STORE = False
+
+def use_store(enabled: bool = True):
+    """
+    Switches the series, station averages and plot_* functions between
+    SQL queries and the in-memory columnar store (see src/store.py).
+    """
+    global USE_STORE
+    USE_STORE = enabled
+    if enabled:
+        store.get_store()
+
+def load_snapshot(directory: str = store.SNAPSHOT_DIR):
+    """
+    Memory-maps the snapshot the scraper exported to directory and reads
+    all graph data from it, even after the database changes.
+    Returns the ObservationStore (see store.frame() for a DataFrame), or
+    None if there's no snapshot.
+    """
+    observations = store.ObservationStore.open(directory)
+    if observations is None:
+        return None
+    store.set_store(observations, pinned=True)
+    use_store()
+    return observations
+
+# Render cache limits for files in GRAPH_OUTPUT_DIR
+GRAPH_CACHE_MAX_FILES = 500
+GRAPH_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+class RenderCache:
+    """
+    LRU cache of rendered graphs, keyed by plot function and arguments.
+    Each entry records the data version it was rendered from and is only
+    returned while that version is current and its files still exist.
+    Least recently used entries are evicted, and their files deleted,
+    once the cache holds more than max_files files or max_bytes bytes.
+    """
+    def __init__(self, max_files, max_bytes):
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # (plot, args) -> (version, result, files, size)
+        self.num_files = 0
+        self.num_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, version):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] == version and all(os.path.exists(f) for f in entry[2]):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, key, version, result):
+        files = _result_files(result)
+        size = sum(os.path.getsize(f) for f in files if os.path.exists(f))
+        with self.lock:
+            # Replaces any stale entry, which shares the same files
+            self._remove(key, delete_files=False)
+            self.entries[key] = (version, result, files, size)
+            self.num_files += len(files)
+            self.num_bytes += size
+
+            while len(self.entries) > 1 and (
+                    self.num_files > self.max_files or self.num_bytes > self.max_bytes):
+                oldest = next(iter(self.entries))
+                self._remove(oldest, delete_files=True)
+                self.evictions += 1
+
+    def _remove(self, key, delete_files):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        self.num_files -= len(entry[2])
+        self.num_bytes -= entry[3]
+        if delete_files:
+            for f in entry[2]:
+                try:
+                    os.remove(f)
+                except OSError:
+                    pass
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.num_files = 0
+            self.num_bytes = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "files": self.num_files,
+                "bytes": self.num_bytes,
+            }
+
+def _result_files(result):
+    if isinstance(result, dict):
+        return list(result.values())
+    return [result]
+
+render_cache = RenderCache(GRAPH_CACHE_MAX_FILES, GRAPH_CACHE_MAX_BYTES)
+
+# Render Manifest #
+# Graphs pre-rendered by python -m src.render_all, recorded in
+# GRAPH_OUTPUT_DIR/manifest.json with the database id and data version they
+# are current for.
+MANIFEST_FILE = "manifest.json"
+
+def manifest_key(plot_name, args):
+    return "/".join([plot_name, *(str(arg) for arg in args)])
+
+class RenderManifest:
+    """
+    Read side of the render_all manifest, reloaded when the file changes.
+    Pre-rendered files aren't added to the render cache, so its eviction
+    never deletes them.
+    """
+    def __init__(self):
+        self.path = None
+        self.mtime = None
+        self.entries = {}
+        self.hits = 0
+        self.lock = threading.Lock()
+
+    def _reload(self):
+        path = os.path.join(GRAPH_OUTPUT_DIR, MANIFEST_FILE)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            self.path, self.mtime, self.entries = path, None, {}
+            return
+        if path == self.path and mtime == self.mtime:
+            return
+        try:
+            with open(path) as f:
+                self.entries = json.load(f).get("entries", {})
+        except (OSError, ValueError) as e:
+            print(f"Error reading render manifest: {e}")
+            self.entries = {}
+        self.path, self.mtime = path, mtime
+
+    def get(self, plot_name, args, version, database_id):
+        """
+        Returns the pre-rendered file name(s) for a plot if they are
+        current for the data version of the database and still exist,
+        otherwise None.
+        """
+        with self.lock:
+            self._reload()
+            entry = self.entries.get(manifest_key(plot_name, args))
+            if (entry and entry["data_version"] == version
+                    and entry.get("database_id") == database_id
+                    and all(os.path.exists(f) for f in _result_files(entry["files"]))):
+                self.hits += 1
+                return entry["files"]
+            return None
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "entries": len(self.entries)}
+
+render_manifest = RenderManifest()
+
+# Render timing #
+# PLOT_RENDER_SECONDS covers a whole uncached plot (query, draw, save),
+# PLOT_SAVEFIG_SECONDS just the fig.savefig() encode and write.
+PLOT_RENDER_SECONDS = metrics.Histogram(
+    "plot_render_seconds", "Time spent drawing a graph, including its query and savefig.", ["plot"])
+PLOT_SAVEFIG_SECONDS = metrics.Histogram(
+    "plot_savefig_seconds", "Time spent in matplotlib savefig.", ["plot"])
+
+_current_plot = threading.local()
+
+def _draw(plot, args):
+    _current_plot.name = plot.__name__
+    try:
+        with metrics.timer(PLOT_RENDER_SECONDS, plot=plot.__name__):
+            return plot(*args)
+    finally:
+        _current_plot.name = None
+
+def _savefig(fig, file_name):
+    with metrics.timer(PLOT_SAVEFIG_SECONDS, plot=getattr(_current_plot, "name", None) or "unknown"):
+        fig.savefig(file_name)
+
+def cached_render(plot):
+    """
+    Decorator for plot_* functions: returns the previously rendered
+    file name(s) when the data hasn't changed since they were drawn.
+    """
+    @functools.wraps(plot)
+    def wrapper(*args):
+        version, result = _rendered(plot, args)
+        if result is not None:
+            return result
+
+        result = _draw(plot, args)
+        if result is not None:
+            render_cache.put((plot.__name__, args), version, result)
+        return result
+    return wrapper
+
+def _rendered(plot, args):
+    """
+    Returns (data version, the graph's file name(s) from the render cache
+    or manifest, or None).
+    """
+    version = db.get_data_version()
+    result = (render_cache.get((plot.__name__, args), version)
+              or render_manifest.get(plot.__name__, args, version, db.get_database_id()))
+    return version, result
+
+# Render Pool #
+# Graphs are drawn on explicit Figure objects, so renders are independent
+# and can run side by side in worker processes.
+RENDER_WORKERS = os.cpu_count() or 1
+
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+def _init_render_worker(database_name, graph_output_dir, use_store):
+    global GRAPH_OUTPUT_DIR, USE_STORE
+    db.DATABASE_NAME = database_name
+    GRAPH_OUTPUT_DIR = graph_output_dir
+    USE_STORE = use_store
+
+def _render_uncached(plot_name, args):
+    """
+    Draws a graph in a render worker. Returns (result, metric observations)
+    so the worker's timings are recorded in the parent process.
+    """
+    plot = globals()[plot_name]
+    with metrics.capture() as observations:
+        result = _draw(plot.__wrapped__, args)
+    return result, observations
+
+def get_render_pool():
+    """
+    Returns the shared render process pool, starting it on first use.
+    Workers are spawned rather than forked so they don't inherit open
+    SQLite connections or threads.
+    """
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(
+                max_workers=RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_render_worker,
+                initargs=(db.DATABASE_NAME, GRAPH_OUTPUT_DIR, USE_STORE))
+        return _render_pool
+
+def shutdown_render_pool():
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is not None:
+            _render_pool.shutdown()
+            _render_pool = None
+
+async def render(plot, *args):
+    """
+    Async equivalent of calling a plot_* function: checks the render
+    cache, and on a miss draws the graph in the render pool.
+    """
+    # The lookups query SQLite and stat files, so run them off the event loop
+    version, result = await asyncio.to_thread(_rendered, plot, args)
+    if result is not None:
+        return result
+
+    future = get_render_pool().submit(_render_uncached, plot.__name__, args)
+    result, observations = await asyncio.wrap_future(future)
+    metrics.replay(observations)
+    if result is not None:
+        render_cache.put((plot.__name__, args), version, result)
+    return result
+
+def render_batch(jobs):
+    """
+    Draws each (plot, args) job in the render pool, bypassing the caches.
+    Yields ((plot, args), result) as jobs finish, with result None if the
+    plot failed.
+    """
+    pool = get_render_pool()
+    futures = {
+        pool.submit(_render_uncached, plot.__name__, args): (plot, args)
+        for plot, args in jobs
+    }
+    for future in as_completed(futures):
+        try:
+            result, observations = future.result()
+            metrics.replay(observations)
+        except Exception as e:
+            plot, args = futures[future]
+            print(f"Error rendering {manifest_key(plot.__name__, args)}: {e}")
+            result = None
+        yield futures[future], result
+
 class Station:
-    def __init__(self, id):
+    __slots__ = ("id", "name", "lat", "lon", "opened", "url", "stats")
+
+    def __init__(self, id, name=None, lon=None, lat=None, opened=None, url=None):
         self.id = id
-        self.name = None
-        self.lat = None
-        self.lon = None
-        self.opened = None
-        self.url = None
+        self.name = name
+        self.lat = lat
+        self.lon = lon
+        self.opened = opened
+        self.url = url
         self.stats = {}
 
     def add_stat(self, name, val):
@@ -27,522 +351,1329 @@ class Station:
         return self.stats[name]
     
     def load_details(self):
-        data = db.get_station(self.id)
-        if data:
-            self.id = data[0]
-            self.name = data[1]
-            self.lon = data[2]
-            self.lat = data[3]
-            self.opened = data[4]
-            self.url = data[5]
+        station = get_station(self.id)
+        if station:
+            self.id = station.id
+            self.name = station.name
+            self.lon = station.lon
+            self.lat = station.lat
+            self.opened = station.opened
+            self.url = station.url
             return True
         else:
             return False
 
+    def copy(self):
+        return Station(self.id, self.name, self.lon, self.lat, self.opened, self.url)
+
     def __repr__(self):
         return f"Station(id={self.id}, name={self.name}, stats={self.stats})"
 
+class StationRegistry:
+    """
+    Every station, loaded in one query, with O(1) lookup by id and name
+    and a spatial index of their coordinates.
+    Reloaded by get_station_registry() once the scraper adds stations.
+    """
+    def __init__(self, version, stations):
+        self.version = version
+        self.by_id = {station.id: station for station in stations}
+        self.by_name = {station.name: station for station in stations}
+
+        located = [s for s in stations if s.lat is not None and s.lon is not None]
+        self.index = spatial.StationIndex(
+            [s.id for s in located], [s.lat for s in located], [s.lon for s in located])
+
+    @classmethod
+    def load(cls):
+        version = db.get_stations_version()
+
+        query = """
+        SELECT id, name, lon, lat, opened, data_url
+        FROM stations
+        ORDER BY id;
+        """
+
+        data = db.select(query, name="registry.stations")
+
+        if data is None:
+            return None
+        return cls(version, [Station(*row) for row in data])
+
+_station_registry = None
+_station_registry_lock = threading.Lock()
+
+def get_station_registry():
+    global _station_registry
+    version = db.get_stations_version()
+    with _station_registry_lock:
+        if _station_registry is None or _station_registry.version != version:
+            _station_registry = StationRegistry.load()
+        return _station_registry
+
+def invalidate_station_registry():
+    global _station_registry
+    with _station_registry_lock:
+        _station_registry = None
+
 # Fetch #
 def list_stations():
     """
     Returns a list of all stations from the stations table,
     in the form of Station objects.
     """
+    registry = get_station_registry()
 
-    query = """
-    SELECT id FROM stations
+    if registry and registry.by_id:
+        return [station.copy() for station in registry.by_id.values()]
+    else:
+        print("Failed to list stations.")
+        return None
+
+def get_station(station_id):
     """
+    Returns the registry's Station for an ID, or None
+    """
+    registry = get_station_registry()
+    if registry is None:
+        return None
+    return registry.by_id.get(station_id)
 
-    result = db.select(query)
+def get_station_by_name(name):
+    """
+    Returns the registry's Station for a name, or None
+    """
+    registry = get_station_registry()
+    if registry is None:
+        return None
+    return registry.by_name.get(name)
 
-    if result:
-        stations = []
-        for station in result:
-            new_station = Station(station[0])
-            new_station.load_details()
-            stations.append(new_station)
-        return stations
-    else:
-        print("Failed to list stations.")
+def nearest_stations(lat, lon, k=5):
+    """
+    Returns [(Station, distance in km)] for the k stations nearest to a
+    location, nearest first, or None if stations couldn't be loaded.
+    """
+    registry = get_station_registry()
+    if registry is None:
+        return None
+    ids, distances = registry.index.nearest(lat, lon, k)
+    return [(registry.by_id[i], float(d)) for i, d in zip(ids.tolist(), distances)]
+
+def stations_within(lat, lon, radius_km, limit=None):
+    """
+    Returns [(Station, distance in km)] for the stations within radius_km
+    of a location, nearest first, or None if stations couldn't be loaded.
+    """
+    registry = get_station_registry()
+    if registry is None:
         return None
+    ids, distances = registry.index.within(lat, lon, radius_km, limit)
+    return [(registry.by_id[i], float(d)) for i, d in zip(ids.tolist(), distances)]
 
 def station_avg_rain(station_id):
     """
     Returns the average rain for a given station
     """
+    if USE_STORE:
+        return store.get_store().mean("rain", station_id)
+
     query = """
-    SELECT AVG(rain)
-    FROM observations 
+    SELECT rain_sum / NULLIF(rain_n, 0)
+    FROM agg_station
     WHERE station_id = ?;
     """
     params = (station_id,)
     
-    data = db.select(query, params)
+    data = db.select(query, params, name="station_avg_rain")
     
-    return data[0][0]
+    if data:
+        return data[0][0]
+    else:
+        return None
 
-def get_station_name(station_id):
+def station_avg_temp(station_id):
     """
-    Returns the name of a station given its ID
+    Returns the average monthly mean temperature for a given station
     """
+    if USE_STORE:
+        return store.get_store().mean("temp", station_id)
+
     query = """
-    SELECT name FROM stations WHERE id = ?;
+    SELECT temp_sum / NULLIF(temp_n, 0)
+    FROM agg_station
+    WHERE station_id = ?;
     """
     params = (station_id,)
 
-    data = db.select(query, params)
+    data = db.select(query, params, name="station_avg_temp")
 
     if data:
         return data[0][0]
     else:
         return None
 
-# CLI Output #
-def print_stations_by_avg_rain(desc: bool = True):
-    
-    stations = list_stations()
-    if stations is None:
-        print("Error fetching stations list")
-        return
+def get_station_name(station_id):
+    """
+    Returns the name of a station given its ID
+    """
+    station = get_station(station_id)
 
-    # Get average rainfall for each station
-    for station in stations:
-        station.add_stat("avg_rain", station_avg_rain(station.id))
+    if station:
+        return station.name
+    else:
+        return None
 
-    # Sort by rainfall
-    sorted_stations = sorted(
-        stations, 
-        key=lambda x: x.stats.get('avg_rain'),
-        reverse=desc)
+# Rankings #
+# metric: (label, unit)
+RANK_METRICS = {
+    "tmax": ("Max Temperature", "ºC"),
+    "tmin": ("Min Temperature", "ºC"),
+    "temp": ("Temperature", "ºC"),
+    "af": ("Air Frost", "days"),
+    "rain": ("Rainfall", "mm"),
+    "sun": ("Sunshine", "hours"),
+}
+RANK_STATISTICS = ("mean", "total", "max", "trend")
+
+def rank_stations(metric: str = "temp", statistic: str = "mean",
+                  start_year: int = None, end_year: int = None, months=None,
+                  top: int = None, desc: bool = True):
+    """
+    Ranks every station by a statistic of one metric's monthly values.
+    Optionally limited to a range of years and/or a set of months (1-12),
+    and to the top N stations.
+    statistic is one of:
+        mean  - average monthly value
+        total - sum of monthly values
+        max   - highest monthly value
+        trend - slope of the yearly averages, per century
+    Means and totals come from the summary tables where the window allows
+    (see _summary_statistic), maxima and other windows from the in-memory
+    store, and trends from the same fits as rank_trends.
+    Returns a list of (Station, value), or None on error.
+    Raises ValueError for an unknown metric or statistic, or top < 1.
+    """
+    if metric not in RANK_METRICS:
+        raise ValueError(f"Unknown metric '{metric}', expected one of {', '.join(RANK_METRICS)}")
+    if statistic not in RANK_STATISTICS:
+        raise ValueError(f"Unknown statistic '{statistic}', expected one of {', '.join(RANK_STATISTICS)}")
+    if top is not None and top < 1:
+        raise ValueError(f"top must be at least 1, got {top}")
+
+    if statistic == "trend":
+        data = _trend_statistic(metric, start_year, end_year, months)
+    elif statistic != "max" and not (months and (start_year is not None or end_year is not None)):
+        data = _summary_statistic(metric, statistic, start_year, end_year, months)
+    else:
+        observations = store.get_store()
+        if observations is None:
+            return None
+        station_ids, values = observations.station_statistic(metric, statistic, start_year, end_year, months)
+        data = list(zip(station_ids.tolist(), values.tolist()))
 
-    print("-"*60)
-    print(f"Average, Monthly Rainfall (mm) per Station")
-    print("-"*60)
-    for station in sorted_stations:
-        print(f" {station.get_stat('avg_rain'):.2f}\t{station.name}")
+    if data is None:
+        return None
 
-def print_stations_by_avg_temp(desc: bool = True):
-    stations = list_stations()
-    if stations is None:
-        print("Error fetching stations list")
-        return
-    # Get average temperature for each station
-    for station in stations:
-        query = """
-        SELECT AVG((tmax + tmin) / 2.0)
-        FROM observations 
-        WHERE station_id = ?;
+    ranking = []
+    for station_id, value in sorted(data, key=lambda row: row[1], reverse=desc):
+        station = get_station(station_id)
+        if station is not None:
+            ranking.append((station, value))
+            if top is not None and len(ranking) == top:
+                break
+    return ranking
+
+def _summary_statistic(metric, statistic, start_year, end_year, months):
+    """
+    The mean or total of a metric for every station from the smallest
+    summary table covering the window: agg_station for all time,
+    agg_station_year for a range of years, agg_station_month for a set of
+    months. Returns a list of (station_id, value), or None on error.
+    """
+    conditions = []
+    params = []
+    if months:
+        table = "agg_station_month"
+        conditions.append(f"month IN ({', '.join('?' * len(months))})")
+        params.extend(months)
+    elif start_year is not None or end_year is not None:
+        table = "agg_station_year"
+        if start_year is not None:
+            conditions.append("year >= ?")
+            params.append(start_year)
+        if end_year is not None:
+            conditions.append("year <= ?")
+            params.append(end_year)
+    else:
+        table = "agg_station"
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    total = f"SUM({metric}_sum)"
+    count = f"SUM({metric}_n)"
+    value = total if statistic == "total" else f"{total} / {count}"
+    query = f"""
+    SELECT station_id, {value}
+    FROM {table}
+    {where}
+    GROUP BY station_id
+    HAVING {count} > 0;
+    """
+
+    return db.select(query, tuple(params), name="rank_stations")
+
+def _trend_statistic(metric, start_year, end_year, months):
+    """
+    Trend of every station's yearly means, per century, fitted as in
+    rank_trends but only over the window: yearly means of the given months
+    (from the store), within the given years. Returns a list of
+    (station_id, value), or None on error.
+    """
+    if months:
+        observations = store.get_store()
+        if observations is None:
+            return None
+        station_ids, years, means = observations.station_year_means(metric, months)
+    else:
+        trends = get_station_trends()
+        if trends is None:
+            return None
+        column = trends.column(metric)
+        station_ids, years, means = trends.station_ids, trends.x, trends.means[:, column]
+
+    if months or start_year is not None or end_year is not None:
+        in_window = np.ones(len(years), dtype=bool)
+        if start_year is not None:
+            in_window &= years >= start_year
+        if end_year is not None:
+            in_window &= years <= end_year
+        slope = fit_trends(years[in_window], means[:, in_window], TREND_MIN_YEARS)["slope"] * 100
+    else:
+        slope = trends.slope[:, column]
+
+    fitted = ~np.isnan(slope)
+    return list(zip(station_ids[fitted].tolist(), slope[fitted].tolist()))
+
+# Trends #
+# Linear trends of yearly means for every station and metric, fitted in
+# one batch from agg_station_year and cached per data version.
+TREND_METRICS = list(db.AGGREGATE_METRICS)
+# Series with fewer years than this get no trend
+TREND_MIN_YEARS = 10
+
+def fit_trends(x, y, min_points=2):
+    """
+    Least-squares lines of y against x for a batch of series at once.
+    x has shape (points,) and y (..., points), with NaN for missing values,
+    so each series is fitted to its own points through masked normal
+    equations. Returns a dict of (...) arrays: slope, intercept, stderr
+    (of the slope), r2 and n, NaN where a series has fewer than
+    min_points points.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    mask = ~np.isnan(y)
+    n = mask.sum(axis=-1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # Centre on each series' own means, so the sums don't cancel
+        x_mean = (mask * x).sum(axis=-1) / n
+        y_mean = np.where(mask, y, 0).sum(axis=-1) / n
+        dx = np.where(mask, x - x_mean[..., None], 0)
+        dy = np.where(mask, y - y_mean[..., None], 0)
+
+        sxx = (dx * dx).sum(axis=-1)
+        sxy = (dx * dy).sum(axis=-1)
+        syy = (dy * dy).sum(axis=-1)
+
+        slope = sxy / sxx
+        residual = np.maximum(syy - slope * sxy, 0)
+        stderr = np.sqrt(residual / (n - 2) / sxx)
+        r2 = np.where(syy > 0, 1 - residual / syy, 1.0)
+
+    fitted = (n >= max(min_points, 2)) & (sxx > 0)
+    return {
+        "slope": np.where(fitted, slope, np.nan),
+        "intercept": np.where(fitted, y_mean - slope * x_mean, np.nan),
+        "stderr": np.where(fitted & (n > 2), stderr, np.nan),
+        "r2": np.where(fitted, r2, np.nan),
+        "n": n,
+    }
+
+class StationTrends:
+    """
+    Trends of every station and metric for one data version: arrays of
+    shape (stations, metrics), with station_ids and TREND_METRICS giving
+    the row and column order. Slopes and standard errors are per century.
+    The yearly means they're fitted to are kept as means, of shape
+    (stations, metrics, years), for the years x.
+    """
+    def __init__(self, version, station_ids, slope, stderr, r2, years, x, means):
+        self.version = version
+        self.station_ids = station_ids
+        self.x = x
+        self.means = means
+        self.slope = slope
+        self.stderr = stderr
+        self.r2 = r2
+        self.years = years
+
+    @classmethod
+    def load(cls):
+        version = db.get_data_version()
+
+        query = f"""
+        SELECT station_id, year,
+            {", ".join(f"{m}_sum / NULLIF({m}_n, 0)" for m in TREND_METRICS)}
+        FROM agg_station_year
+        ORDER BY station_id, year;
         """
-        params = (station.id,)
-        
-        data = db.select(query, params)
-        station.add_stat("avg_temp", data[0][0])
 
-    # Sort by temperature
-    sorted_stations = sorted(
-        stations, 
-        key=lambda x: x.stats.get('avg_temp'),
-        reverse=desc)
+        data = db.select(query, name="trends.station_years")
+
+        if data is None:
+            return None
+        rows = np.array(data, dtype=float).reshape(-1, 2 + len(TREND_METRICS))
+
+        # Scatter the yearly means into a dense (stations, metrics, years) array
+        station_ids, stations = np.unique(rows[:, 0].astype(np.int64), return_inverse=True)
+        first = int(rows[:, 1].min()) if len(rows) else 0
+        years = rows[:, 1].astype(np.int64) - first
+        x = np.arange(first, first + (years.max() + 1 if len(rows) else 0))
+        y = np.full((len(station_ids), len(TREND_METRICS), len(x)), np.nan)
+        y[stations, :, years] = rows[:, 2:]
+
+        fits = fit_trends(x, y, TREND_MIN_YEARS)
+        return cls(version, station_ids, fits["slope"] * 100, fits["stderr"] * 100, fits["r2"], fits["n"], x, y)
+
+    def column(self, metric):
+        if metric not in TREND_METRICS:
+            raise ValueError(f"Unknown metric '{metric}', expected one of {', '.join(TREND_METRICS)}")
+        return TREND_METRICS.index(metric)
+
+_station_trends = None
+_station_trends_lock = threading.Lock()
+
+def get_station_trends():
+    """
+    Returns the StationTrends of the current data version, fitting them on
+    first use after the data changes.
+    """
+    global _station_trends
+    version = db.get_data_version()
+    with _station_trends_lock:
+        if _station_trends is None or _station_trends.version != version:
+            _station_trends = StationTrends.load()
+        return _station_trends
+
+def rank_trends(metric: str = "temp", top: int = None, desc: bool = True):
+    """
+    Ranks stations by the trend of a metric's yearly means, per century.
+    Returns a list of (Station, {"slope", "stderr", "r2", "years"}), or
+    None on error. Raises ValueError for an unknown metric.
+    """
+    trends = get_station_trends()
+    if trends is None:
+        return None
+    column = trends.column(metric)
+
+    slope = trends.slope[:, column]
+    fitted = np.flatnonzero(~np.isnan(slope))
+    order = fitted[np.argsort(-slope[fitted] if desc else slope[fitted], kind='stable')]
+
+    ranking = []
+    for i in order:
+        station = get_station(int(trends.station_ids[i]))
+        if station is None:
+            continue
+        stderr = trends.stderr[i, column]
+        ranking.append((station, {
+            "slope": float(slope[i]),
+            "stderr": None if np.isnan(stderr) else float(stderr),
+            "r2": float(trends.r2[i, column]),
+            "years": int(trends.years[i, column]),
+        }))
+        if top is not None and len(ranking) == top:
+            break
+    return ranking
+
+# CLI Output #
+def print_station_ranking(metric: str = "temp", statistic: str = "mean", desc: bool = True, **window):
+    """
+    Prints rank_stations(metric, statistic, ...) as a table.
+    """
+    ranking = rank_stations(metric, statistic, desc=desc, **window)
+    if ranking is None:
+        print("Error fetching station ranking")
+        return
+
+    label, unit = RANK_METRICS[metric]
+    title = {
+        "mean": f"Average, Monthly {label} ({unit}) per Station",
+        "total": f"Total {label} ({unit}) per Station",
+        "max": f"Highest Monthly {label} ({unit}) per Station",
+        "trend": f"{label} Trend ({unit}/century) per Station",
+    }[statistic]
 
     print("-"*60)
-    print(f"Average, Monthly Temperature (ºC) per Station")
+    print(title)
     print("-"*60)
-    for station in sorted_stations:
-        print(f" {station.get_stat('avg_temp'):.2f}\t{station.name}")
+    for station, value in ranking:
+        print(f" {value:.2f}\t{station.name}")
 
-# Graphing #
-# Station-specific Graphs #
-def plot_station_temp_trend(station_id):
-    query = """
-    SELECT year, 
-        AVG(tmax) AS avg_tmax,
-        AVG(tmin) AS avg_tmin,
-        AVG((tmax + tmin) / 2.0) AS avg_temp
-    FROM observations
-    WHERE station_id = ?
-    GROUP BY year
-    ORDER BY year;
+def print_stations_by_avg_rain(desc: bool = True):
+    print_station_ranking("rain", "mean", desc)
+
+def print_stations_by_avg_temp(desc: bool = True):
+    print_station_ranking("temp", "mean", desc)
+
+# Series #
+# The data behind each graph, shared by the plot_* functions and the
+# API's data endpoints.
+def _frame(data, columns):
     """
-    params = (station_id,)
+    Builds a series DataFrame from query rows: the first column is the
+    key (year, month, lat) and the rest are float values.
+    """
+    df = pd.DataFrame(data, columns=columns)
+    df[columns[1:]] = df[columns[1:]].astype(float)
+    return df
 
-    data = db.select(query, params)
+def fit_trend(x, y):
+    """
+    Fits a least-squares line to y against x, ignoring missing values.
+    Returns (slope, intercept), or None if there are fewer than two points.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    mask = ~(np.isnan(x) | np.isnan(y))
+    if mask.sum() < 2:
+        return None
 
-    if data is None:
-        print("Error fetching temperature data.")
-        return
-    station_name = get_station_name(station_id)
-    file_name = f"{GRAPH_OUTPUT_DIR}/{station_name}_temp_trend.png"
-    df = pd.DataFrame(data, columns=['year', 'avg_tmax', 'avg_tmin', 'avg_temp'])
-    plt.plot(df['year'], df['avg_temp'], color="black", label="Avg Temp")
-    plt.plot(df['year'], df['avg_tmax'], color="red", label="Avg Tmax")
-    plt.plot(df['year'], df['avg_tmin'], color="blue", label="Avg Tmin")
-
-    # Trend line for avg_temp
-    z = np.polyfit(df['year'], df['avg_temp'], 1)
-    p = np.poly1d(z)
-    plt.plot(df['year'], p(df['year']), "--", label="Trend Line", color="grey")
-
-    plt.xlabel("Year")
-    plt.ylabel("Temperature (ºC)")
-    plt.title(f"Annual Temperature Trend for {station_name}")
-    plt.legend()
-    plt.grid()
-    plt.savefig(file_name)
-    plt.close()
+    slope, intercept = np.polyfit(x[mask], y[mask], 1)
+    return float(slope), float(intercept)
 
-    return file_name
+def station_temp_trend_series(station_id):
+    """
+    Returns a DataFrame of year, avg_tmax, avg_tmin, avg_temp for a station.
+    """
+    if USE_STORE:
+        return store.get_store().group_means('year', ['tmax', 'tmin', 'temp'], station_id)
 
-def plot_station_monthly_rainfall(station_id):
     query = """
-    SELECT month, 
-        AVG(rain) AS avg_rain
-    FROM observations
+    SELECT year, 
+        tmax_sum / NULLIF(tmax_n, 0) AS avg_tmax,
+        tmin_sum / NULLIF(tmin_n, 0) AS avg_tmin,
+        temp_sum / NULLIF(temp_n, 0) AS avg_temp
+    FROM agg_station_year
     WHERE station_id = ?
-    GROUP BY month
-    ORDER BY month;
+    ORDER BY year;
     """
     params = (station_id,)
 
-    data = db.select(query, params)
+    data = db.select(query, params, name="station_temp_trend_series")
 
     if data is None:
-        print("Error fetching rainfall data.")
-        return
-    station_name = get_station_name(station_id)
-    file_name = f"{GRAPH_OUTPUT_DIR}/{station_name}_monthly_rainfall.png"
-    df = pd.DataFrame(data, columns=['month', 'avg_rain'])
-    df['month_name'] = pd.to_datetime(df['month'], format='%m').dt.strftime('%b')
-    plt.bar(df['month_name'], df['avg_rain'], color="blue")
-
-    plt.xlabel("Month")
-    plt.ylabel("Average Rainfall (mm)")
-    plt.title(f"Average Monthly Rainfall for {station_name}")
-    plt.grid(axis='y')
-    plt.savefig(file_name)
-    plt.close()
+        return None
+    return _frame(data, ['year', 'avg_tmax', 'avg_tmin', 'avg_temp'])
 
-    return file_name
+def station_monthly_series(station_id):
+    """
+    Returns a DataFrame of month, avg_rain, avg_sun for a station.
+    """
+    if USE_STORE:
+        return store.get_store().group_means('month', ['rain', 'sun'], station_id)
 
-def plot_station_monthly_sunshine(station_id):
     query = """
     SELECT month, 
-        AVG(sun) AS avg_sun
-    FROM observations
+        rain_sum / NULLIF(rain_n, 0) AS avg_rain,
+        sun_sum / NULLIF(sun_n, 0) AS avg_sun
+    FROM agg_station_month
     WHERE station_id = ?
-    GROUP BY month
     ORDER BY month;
     """
     params = (station_id,)
 
-    data = db.select(query, params)
+    data = db.select(query, params, name="station_monthly_series")
 
     if data is None:
-        print("Error fetching sunshine data.")
-        return
-    station_name = get_station_name(station_id)
-    file_name = f"{GRAPH_OUTPUT_DIR}/{station_name}_monthly_sunshine.png"
-    df = pd.DataFrame(data, columns=['month', 'avg_sun'])
-    df['month_name'] = pd.to_datetime(df['month'], format='%m').dt.strftime('%b')
-    plt.bar(df['month_name'], df['avg_sun'], color="orange")
-
-    plt.xlabel("Month")
-    plt.ylabel("Average Sunshine (hours)")
-    plt.title(f"Average Monthly Sunshine for {station_name}")
-    plt.grid(axis='y')
-    plt.savefig(file_name)
-    plt.close()
+        return None
+    return _frame(data, ['month', 'avg_rain', 'avg_sun'])
 
-    return file_name
+def overall_yearly_series():
+    """
+    Returns a DataFrame of year, avg_temp, avg_rain, avg_sun across all stations.
+    """
+    if USE_STORE:
+        return store.get_store().group_means('year', ['temp', 'rain', 'sun'])
 
-# Overall Graphs #
-def plot_overall_temp_trend():
     query = """
     SELECT year, 
-        AVG((tmax + tmin) / 2.0) AS avg_temp
-    FROM observations
-    WHERE tmax IS NOT NULL AND tmin IS NOT NULL
-    GROUP BY year
+        temp_sum / NULLIF(temp_n, 0) AS avg_temp,
+        rain_sum / NULLIF(rain_n, 0) AS avg_rain,
+        sun_sum / NULLIF(sun_n, 0) AS avg_sun
+    FROM agg_year
     ORDER BY year;
     """
 
-    data = db.select(query)
+    data = db.select(query, name="overall_yearly_series")
 
     if data is None:
-        print("Error fetching temperature data.")
-        return
-    
-    file_name = f"{GRAPH_OUTPUT_DIR}/overall_temp_trend.png"
-    df = pd.DataFrame(data, columns=['year', 'avg_temp'])
-    plt.scatter(df['year'], df['avg_temp'], color="black", label="Avg Temp")
-
-    # Trend line for avg_temp
-    z = np.polyfit(df['year'], df['avg_temp'], 1)
-    p = np.poly1d(z)
-    plt.plot(df['year'], p(df['year']), "--", label="Trend Line", color="red")
-    temp_delta_per_century = z[0] * 100
-    sign = '+' if temp_delta_per_century >= 0 else '-'
-    # Include trend info box
-    plt.annotate(f"Trend: {sign}{temp_delta_per_century:.2f} ºC/century", xy=(0.05, 0.95), xycoords='axes fraction',
-                 fontsize=10, ha='left', va='top',
-                 bbox=dict(boxstyle="round,pad=0.3", fc="white", ec="black", lw=1))
-
-    plt.xlabel("Year")
-    plt.ylabel("Temperature (ºC)")
-    plt.title(f"Overall Annual Temperature Trend")
-    plt.legend()
-    plt.grid()
-    plt.savefig(file_name)
-    plt.close()
+        return None
+    return _frame(data, ['year', 'avg_temp', 'avg_rain', 'avg_sun'])
 
-    return file_name
+def overall_monthly_series():
+    """
+    Returns a DataFrame of month, avg_temp, avg_rain, avg_sun across all stations.
+    """
+    if USE_STORE:
+        return store.get_store().group_means('month', ['temp', 'rain', 'sun'])
 
-def plot_overall_monthly_temp():
     query = """
     SELECT month, 
-        AVG((tmax + tmin) / 2.0) AS avg_temp
-    FROM observations
-    WHERE tmax IS NOT NULL AND tmin IS NOT NULL
-    GROUP BY month
+        temp_sum / NULLIF(temp_n, 0) AS avg_temp,
+        rain_sum / NULLIF(rain_n, 0) AS avg_rain,
+        sun_sum / NULLIF(sun_n, 0) AS avg_sun
+    FROM agg_month
     ORDER BY month;
     """
 
-    data = db.select(query)
+    data = db.select(query, name="overall_monthly_series")
 
     if data is None:
-        print("Error fetching rainfall data.")
-        return
+        return None
+    return _frame(data, ['month', 'avg_temp', 'avg_rain', 'avg_sun'])
+
+def latitude_series():
+    """
+    Returns a DataFrame of lat, avg_rain, avg_temp, avg_sun with one row per station.
+    """
+    if USE_STORE:
+        observations = store.get_store()
+        df = observations.group_means('station_id', ['rain', 'temp', 'sun'])
+        df.insert(0, 'lat', observations.stations['lat'].reindex(df['station_id']).to_numpy())
+        return df.drop(columns='station_id').sort_values('lat', kind='stable').reset_index(drop=True)
+
+    query = """
+    SELECT s.lat,
+        a.rain_sum / NULLIF(a.rain_n, 0) AS avg_rain,
+        a.temp_sum / NULLIF(a.temp_n, 0) AS avg_temp,
+        a.sun_sum / NULLIF(a.sun_n, 0) AS avg_sun
+    FROM stations s
+    JOIN agg_station a ON s.id = a.station_id
+    ORDER BY s.lat;
+    """
 
-    file_name = f"{GRAPH_OUTPUT_DIR}/average_monthly_temp.png"
-    df = pd.DataFrame(data, columns=['month', 'avg_temp'])
-    df['month_name'] = pd.to_datetime(df['month'], format='%m').dt.strftime('%b')
-    plt.bar(df['month_name'], df['avg_temp'], color="red")
+    data = db.select(query, name="latitude_series")
 
-    plt.xlabel("Month")
-    plt.ylabel("Average Tempurature (°C)")
-    plt.title(f"Average Monthly Tempurature Across All Stations")
-    plt.grid(axis='y')
-    plt.savefig(file_name)
-    plt.close()
+    if data is None:
+        return None
+    return _frame(data, ['lat', 'avg_rain', 'avg_temp', 'avg_sun'])
 
-    return file_name
+def station_anomaly_series(station_id):
+    """
+    Returns a DataFrame of year, month and anom_<metric> for each metric:
+    a station's monthly values minus its climatology over the baseline.
+    """
+    anomalies.ensure_current()
 
-def plot_overall_rainfall_trend():
     query = """
-    SELECT year, 
-        AVG(rain) AS avg_rain
-    FROM observations
-    WHERE rain IS NOT NULL
-    GROUP BY year
-    ORDER BY year;
+    SELECT year, month, tmax, tmin, temp, af, rain, sun
+    FROM anomalies
+    WHERE station_id = ?
+    ORDER BY year, month;
     """
+    params = (station_id,)
 
-    data = db.select(query)
+    data = db.select(query, params, name="station_anomaly_series")
 
     if data is None:
-        print("Error fetching temperature data.")
-        return
-    
-    file_name = f"{GRAPH_OUTPUT_DIR}/overall_rainfall_trend.png"
-    df = pd.DataFrame(data, columns=['year', 'avg_rain'])
-    plt.scatter(df['year'], df['avg_rain'], color="black", label="Avg Rainfall")
-
-    # Trend line for avg_rain
-    z = np.polyfit(df['year'], df['avg_rain'], 1)
-    p = np.poly1d(z)
-    plt.plot(df['year'], p(df['year']), "--", label="Trend Line", color="blue")
-    rain_delta_per_century = z[0] * 100
-    sign = '+' if rain_delta_per_century >= 0 else '-'
-    # Include trend info box
-    plt.annotate(f"Trend: {sign}{rain_delta_per_century:.2f} mm/century", xy=(0.05, 0.95), xycoords='axes fraction',
-                 fontsize=10, ha='left', va='top',
-                 bbox=dict(boxstyle="round,pad=0.3", fc="white", ec="black", lw=1))
-
-    plt.xlabel("Year")
-    plt.ylabel("Rainfall (mm)")
-    plt.title(f"Overall Annual Rainfall Trend")
-    plt.legend()
-    plt.grid()
-    plt.savefig(file_name)
-    plt.close()
+        return None
+    return _anomaly_frame(data)
 
-    return file_name
+def overall_anomaly_series():
+    """
+    Returns a DataFrame of year, month and anom_<metric> for each metric,
+    averaged across all stations with an anomaly that month.
+    """
+    anomalies.ensure_current()
 
-def plot_overall_monthly_rainfall():
-    query = """
-    SELECT month, 
-        AVG(rain) AS avg_rain
-    FROM observations
-    WHERE rain IS NOT NULL
-    GROUP BY month
-    ORDER BY month;
+    query = f"""
+    SELECT year, month,
+        {", ".join(f"{m}_sum / NULLIF({m}_n, 0)" for m in anomalies.METRICS)}
+    FROM agg_anomaly
+    ORDER BY year, month;
     """
 
-    data = db.select(query)
+    data = db.select(query, name="overall_anomaly_series")
 
     if data is None:
-        print("Error fetching rainfall data.")
-        return
+        return None
+    return _anomaly_frame(data)
 
-    file_name = f"{GRAPH_OUTPUT_DIR}/average_monthly_rainfall.png"
-    df = pd.DataFrame(data, columns=['month', 'avg_rain'])
-    df['month_name'] = pd.to_datetime(df['month'], format='%m').dt.strftime('%b')
-    plt.bar(df['month_name'], df['avg_rain'], color="blue")
+def _anomaly_frame(data):
+    columns = [f"anom_{metric}" for metric in anomalies.METRICS]
+    df = pd.DataFrame(data, columns=['year', 'month'] + columns)
+    df[columns] = df[columns].astype(float)
+    return df
 
-    plt.xlabel("Month")
-    plt.ylabel("Average Rainfall (mm)")
-    plt.title(f"Average Monthly Rainfall Across All Stations")
-    plt.grid(axis='y')
-    plt.savefig(file_name)
-    plt.close()
+def to_columns(df, decimals=3):
+    """
+    Returns a DataFrame as compact columnar JSON data: {column: [values]},
+    rounded, with None for missing values.
+    """
+    return {
+        column: df[column].round(decimals).astype(object).where(df[column].notna(), None).tolist()
+        for column in df.columns
+    }
 
-    return file_name
+def trend_coefficients(df, columns):
+    """
+    Returns {column: {"slope", "intercept"}} for a trend line of each
+    column against the series' first column, or None where it can't be fitted.
+    """
+    trends = {}
+    for column in columns:
+        z = fit_trend(df[df.columns[0]], df[column])
+        trends[column] = {"slope": z[0], "intercept": z[1]} if z is not None else None
+    return trends
 
-def plot_overall_sunshine_trend():
-    query = """
-    SELECT year, 
-        AVG(sun) AS avg_sun
-    FROM observations
-    WHERE sun IS NOT NULL
-    GROUP BY year
-    ORDER BY year;
+def _series(df, column):
     """
+    Returns (x, y) for one column of a series, without missing values.
+    """
+    valid = df[column].notna()
+    return df[df.columns[0]][valid], df[column][valid]
 
-    data = db.select(query)
+def _month_names(months):
+    return pd.to_datetime(months.astype(int), format='%m').dt.strftime('%b')
 
-    if data is None:
-        print("Error fetching sunshine data.")
-        return
-    
-    file_name = f"{GRAPH_OUTPUT_DIR}/overall_sunshine_trend.png"
-    df = pd.DataFrame(data, columns=['year', 'avg_sun'])
-    plt.scatter(df['year'], df['avg_sun'], color="black", label="Avg Sunshine")
-
-    # Trend line for avg_sun
-    z = np.polyfit(df['year'], df['avg_sun'], 1)
-    p = np.poly1d(z)
-    plt.plot(df['year'], p(df['year']), "--", label="Trend Line", color="orange")
-    sun_delta_per_century = z[0] * 100
-    sign = '+' if sun_delta_per_century >= 0 else '-'
-    # Include trend info box
-    plt.annotate(f"Trend: {sign}{sun_delta_per_century:.2f} hours/century", xy=(0.05, 0.95), xycoords='axes fraction',
-                 fontsize=10, ha='left', va='top',
-                 bbox=dict(boxstyle="round,pad=0.3", fc="white", ec="black", lw=1))
-
-    plt.xlabel("Year")
-    plt.ylabel("Sunshine (hours)")
-    plt.title(f"Overall Annual Sunshine Trend")
-    plt.legend()
-    plt.grid()
-    plt.savefig(file_name)
-    plt.close()
+# Graphing #
+# Every graph is described by a ChartSpec in CHARTS. chart_figure() draws
+# one, the plot_* functions save it to GRAPH_OUTPUT_DIR and render_image()
+# encodes it in memory.
+#
+# Setting up a Figure (axes, ticks, legend) costs about as much as encoding
+# it, so each thread keeps the last figure drawn for every chart as a
+# template, and later renders only swap its data, title and annotation.
+# A chart is drawn from scratch when its shape changes: a trend line
+# appears or goes, or a different set of months has data.
+CHART_TEMPLATES = True
+
+_chart_templates = threading.local()
+
+class ChartSpec:
+    """
+    Declarative description of a graph.
 
-    return file_name
+    kind is "lines" (a line per (column, colour, label) in lines, with a
+    trend line of the first), "bars" (monthly bars of column) or "scatter"
+    (column against the series' first column, with a trend line and an
+    annotation of its slope times trend_scale). title and file_name are
+    formatted with {station} for station graphs.
+    """
+    def __init__(self, kind, series, title, file_name, xlabel, ylabel, data_label,
+                 column=None, colour=None, label=None, lines=(),
+                 trend_colour="grey", trend_scale=1, annotation=None):
+        self.kind = kind
+        self.series = series
+        self.title = title
+        self.file_name = file_name
+        self.xlabel = xlabel
+        self.ylabel = ylabel
+        self.data_label = data_label
+        self.column = column
+        self.colour = colour
+        self.label = label
+        self.lines = lines
+        self.trend_colour = trend_colour
+        self.trend_scale = trend_scale
+        self.annotation = annotation
+
+def _trend_spec(column, label, colour, unit, title, ylabel, file_name, data_label):
+    return ChartSpec(
+        "scatter", overall_yearly_series, title, file_name, "Year", ylabel, data_label,
+        column=column, colour="black", label=f"Avg {label}", trend_colour=colour,
+        trend_scale=100, annotation=f"Trend: {{trend:+.2f}} {unit}/century")
+
+def _monthly_spec(series, column, colour, title, ylabel, file_name, data_label):
+    return ChartSpec(
+        "bars", series, title, file_name, "Month", ylabel, data_label,
+        column=column, colour=colour)
+
+def _latitude_spec(column, colour, unit, ylabel, title, key):
+    return ChartSpec(
+        "scatter", latitude_series, title, f"lat_{key}_correlation.png", "Latitude", ylabel,
+        "latitude correlation", column=column, colour=colour, trend_colour="red",
+        annotation=f"Trend: {{trend:.2f}} {unit}/degree")
+
+CHARTS = {
+    "station": {
+        "temp_trend": ChartSpec(
+            "lines", station_temp_trend_series,
+            "Annual Temperature Trend for {station}", "{station}_temp_trend.png",
+            "Year", "Temperature (ºC)", "temperature",
+            lines=(('avg_temp', "black", "Avg Temp"),
+                   ('avg_tmax', "red", "Avg Tmax"),
+                   ('avg_tmin', "blue", "Avg Tmin"))),
+        "monthly_rainfall": _monthly_spec(
+            station_monthly_series, 'avg_rain', "blue",
+            "Average Monthly Rainfall for {station}", "Average Rainfall (mm)",
+            "{station}_monthly_rainfall.png", "rainfall"),
+        "monthly_sunshine": _monthly_spec(
+            station_monthly_series, 'avg_sun', "orange",
+            "Average Monthly Sunshine for {station}", "Average Sunshine (hours)",
+            "{station}_monthly_sunshine.png", "sunshine"),
+    },
+    "overall": {
+        "temp_trend": _trend_spec(
+            'avg_temp', "Temp", "red", "ºC",
+            "Overall Annual Temperature Trend", "Temperature (ºC)",
+            "overall_temp_trend.png", "temp"),
+        "rainfall_trend": _trend_spec(
+            'avg_rain', "Rainfall", "blue", "mm",
+            "Overall Annual Rainfall Trend", "Rainfall (mm)",
+            "overall_rainfall_trend.png", "rainfall"),
+        "sunshine_trend": _trend_spec(
+            'avg_sun', "Sunshine", "orange", "hours",
+            "Overall Annual Sunshine Trend", "Sunshine (hours)",
+            "overall_sunshine_trend.png", "sunshine"),
+        "monthly_temp": _monthly_spec(
+            overall_monthly_series, 'avg_temp', "red",
+            "Average Monthly Tempurature Across All Stations", "Average Tempurature (°C)",
+            "average_monthly_temp.png", "temperature"),
+        "monthly_rainfall": _monthly_spec(
+            overall_monthly_series, 'avg_rain', "blue",
+            "Average Monthly Rainfall Across All Stations", "Average Rainfall (mm)",
+            "average_monthly_rainfall.png", "rainfall"),
+        "monthly_sunshine": _monthly_spec(
+            overall_monthly_series, 'avg_sun', "orange",
+            "Average Monthly Sunshine Across All Stations", "Average Sunshine (hours)",
+            "average_monthly_sunshine.png", "sunshine"),
+    },
+    "latitude": {
+        'rain': _latitude_spec('avg_rain', "blue", "mm", "Average Monthly Rainfall (mm)",
+                               "Latitude vs Average Monthly Rainfall", 'rain'),
+        'temp': _latitude_spec('avg_temp', "red", "ºC", "Average Monthly Temperature (ºC)",
+                               "Latitude vs Average Monthly Temperature", 'temp'),
+        'sun': _latitude_spec('avg_sun', "orange", "hours", "Average Monthly Sunshine (hours)",
+                              "Latitude vs Average Monthly Sunshine", 'sun'),
+    },
+}
+
+def _chart_data(spec, df):
+    """
+    Returns (shape, x, ys, trend, note) for drawing a chart from its series.
+    Charts with the same shape can share a template.
+    """
+    if spec.kind == "lines":
+        x = df[df.columns[0]]
+        ys = [df[column] for column, _, _ in spec.lines]
+    else:
+        x, y = _series(df, spec.column)
+        ys = [y]
 
-def plot_overall_monthly_sunshine():
-    query = """
-    SELECT month, 
-        AVG(sun) AS avg_sun
-    FROM observations
-    WHERE sun IS NOT NULL
-    GROUP BY month
-    ORDER BY month;
+    if spec.kind == "bars":
+        x = list(_month_names(x))
+        return tuple(x), x, ys, None, None
+
+    z = fit_trend(x, ys[0])
+    if z is None:
+        return (False,), x, ys, None, None
+    trend = np.poly1d(z)(x)
+    note = spec.annotation.format(trend=z[0] * spec.trend_scale) if spec.annotation else None
+    return (True,), x, ys, trend, note
+
+class ChartTemplate:
+    """
+    A drawn chart and its artists, which later charts of the same spec and
+    shape update in place.
     """
+    def __init__(self, spec, shape, x, ys, trend, note, title):
+        self.spec = spec
+        self.shape = shape
+        self.fig = Figure()
+        self.size = self.fig.get_size_inches().copy()
+        ax = self.ax = self.fig.subplots()
+
+        if spec.kind == "lines":
+            self.artists = [
+                ax.plot(x, y, color=colour, label=label)[0]
+                for y, (_, colour, label) in zip(ys, spec.lines)
+            ]
+        elif spec.kind == "bars":
+            self.artists = [ax.bar(x, ys[0], color=spec.colour)]
+        else:
+            self.artists = [ax.scatter(x, ys[0], color=spec.colour, label=spec.label)]
+
+        self.trend_line = None
+        if trend is not None:
+            self.trend_line = ax.plot(x, trend, "--", label="Trend Line", color=spec.trend_colour)[0]
+
+        self.note = None
+        if note is not None:
+            # Include trend info box
+            self.note = ax.annotate(note, xy=(0.05, 0.95), xycoords='axes fraction',
+                                    fontsize=10, ha='left', va='top',
+                                    bbox=dict(boxstyle="round,pad=0.3", fc="white", ec="black", lw=1))
+
+        ax.set_xlabel(spec.xlabel)
+        ax.set_ylabel(spec.ylabel)
+        ax.set_title(title)
+        if spec.kind == "bars":
+            ax.grid(axis='y')
+        else:
+            if ax.get_legend_handles_labels()[0]:
+                ax.legend()
+            ax.grid()
 
-    data = db.select(query)
+    def update(self, x, ys, trend, note, title):
+        """
+        Swaps in another chart's data and rescales the axes.
+        """
+        if self.spec.kind == "lines":
+            for artist, y in zip(self.artists, ys):
+                artist.set_data(x, y)
+        elif self.spec.kind == "bars":
+            for bar, height in zip(self.artists[0], ys[0]):
+                bar.set_height(height)
+        else:
+            self.artists[0].set_offsets(np.column_stack([x, ys[0]]))
 
-    if data is None:
-        print("Error fetching sunshine data.")
+        if self.trend_line is not None:
+            self.trend_line.set_data(x, trend)
+        if self.note is not None:
+            self.note.set_text(note)
+        self.ax.set_title(title)
+
+        self.ax.relim()
+        self.ax.autoscale_view()
+        # figure_bytes() resizes figures
+        self.fig.set_size_inches(self.size)
+
+def _chart_context(args):
+    return {"station": get_station_name(args[0])} if args else {}
+
+def chart_figure(group, graph, *args, df=None):
+    """
+    Draws a CHARTS graph. df is its series, fetched if not given.
+    Returns the Figure, or None if the data couldn't be fetched.
+
+    With CHART_TEMPLATES on, the figure is this thread's template for the
+    graph, so it is only valid until the next chart_figure() call for it.
+    """
+    spec = CHARTS[group][graph]
+    if df is None:
+        df = spec.series(*args)
+
+    if df is None:
+        print(f"Error fetching {spec.data_label} data.")
         return
 
-    file_name = f"{GRAPH_OUTPUT_DIR}/average_monthly_sunshine.png"
-    df = pd.DataFrame(data, columns=['month', 'avg_sun'])
-    df['month_name'] = pd.to_datetime(df['month'], format='%m').dt.strftime('%b')
-    plt.bar(df['month_name'], df['avg_sun'], color="orange")
+    title = spec.title.format(**_chart_context(args))
+    shape, x, ys, trend, note = _chart_data(spec, df)
+
+    if not CHART_TEMPLATES:
+        return ChartTemplate(spec, shape, x, ys, trend, note, title).fig
 
-    plt.xlabel("Month")
-    plt.ylabel("Average Sunshine (hours)")
-    plt.title(f"Average Monthly Sunshine Across All Stations")
-    plt.grid(axis='y')
-    plt.savefig(file_name)
-    plt.close()
+    templates = getattr(_chart_templates, "charts", None)
+    if templates is None:
+        templates = _chart_templates.charts = {}
 
+    template = templates.get((group, graph))
+    if template is not None and template.shape == shape:
+        template.update(x, ys, trend, note, title)
+    else:
+        template = templates[(group, graph)] = ChartTemplate(spec, shape, x, ys, trend, note, title)
+    return template.fig
+
+def save_chart(group, graph, *args, df=None):
+    """
+    Draws a CHARTS graph into GRAPH_OUTPUT_DIR. Returns the file name.
+    """
+    fig = chart_figure(group, graph, *args, df=df)
+    if fig is None:
+        return
+    file_name = f"{GRAPH_OUTPUT_DIR}/{CHARTS[group][graph].file_name.format(**_chart_context(args))}"
+    _savefig(fig, file_name)
     return file_name
 
+# Station-specific Graphs #
+@cached_render
+def plot_station_temp_trend(station_id):
+    return save_chart("station", "temp_trend", station_id)
+
+@cached_render
+def plot_station_monthly_rainfall(station_id):
+    return save_chart("station", "monthly_rainfall", station_id)
+
+@cached_render
+def plot_station_monthly_sunshine(station_id):
+    return save_chart("station", "monthly_sunshine", station_id)
+
+# Overall Graphs #
+@cached_render
+def plot_overall_temp_trend():
+    return save_chart("overall", "temp_trend")
+
+@cached_render
+def plot_overall_monthly_temp():
+    return save_chart("overall", "monthly_temp")
+
+@cached_render
+def plot_overall_rainfall_trend():
+    return save_chart("overall", "rainfall_trend")
+
+@cached_render
+def plot_overall_monthly_rainfall():
+    return save_chart("overall", "monthly_rainfall")
+
+@cached_render
+def plot_overall_sunshine_trend():
+    return save_chart("overall", "sunshine_trend")
+
+@cached_render
+def plot_overall_monthly_sunshine():
+    return save_chart("overall", "monthly_sunshine")
+
+@cached_render
 def plot_lat_against():
-    query = """
-    SELECT s.lat,
-        AVG(o.rain) AS avg_rain,
-        AVG((o.tmax + o.tmin) / 2.0) AS avg_temp,
-        AVG(o.sun) AS avg_sun
-    FROM stations s
-    JOIN observations o ON s.id = o.station_id
-    GROUP BY s.id
-    ORDER BY s.lat;
-    """
-    data = db.select(query)
+    df = latitude_series()
 
-    if data is None:
+    if df is None:
         print("Error fetching latitude correlation data.")
         return
-    
-    df = pd.DataFrame(data, columns=['lat', 'avg_rain', 'avg_temp', 'avg_sun'])
-
-    filenames = {}
-    filenames['rain'] = f"{GRAPH_OUTPUT_DIR}/lat_rain_correlation.png"
-
-    z = np.polyfit(df['lat'], df['avg_rain'], 1)
-    p = np.poly1d(z)
-    mm_per_degree = z[0]
-    plt.annotate(f"Trend: {mm_per_degree:.2f} mm/degree", xy=(0.05, 0.95), xycoords='axes fraction',
-                 fontsize=10, ha='left', va='top',
-                 bbox=dict(boxstyle="round,pad=0.3", fc="white", ec="black", lw=1))
-    plt.plot(df['lat'], p(df['lat']), "--", label="Trend Line", color="red")
-    plt.legend()
-
-    plt.scatter(df['lat'], df['avg_rain'], color="blue")
-    plt.xlabel("Latitude")
-    plt.ylabel("Average Monthly Rainfall (mm)")
-    plt.title(f"Latitude vs Average Monthly Rainfall")
-    plt.grid()
-    plt.savefig(filenames['rain'])
-    plt.close()
-
-    filenames['temp'] = f"{GRAPH_OUTPUT_DIR}/lat_temp_correlation.png"
-
-    z = np.polyfit(df['lat'], df['avg_temp'], 1)
-    p = np.poly1d(z)
-    celsius_per_degree = z[0]
-    plt.annotate(f"Trend: {celsius_per_degree:.2f} ºC/degree", xy=(0.05, 0.95), xycoords='axes fraction',
-                 fontsize=10, ha='left', va='top',
-                 bbox=dict(boxstyle="round,pad=0.3", fc="white", ec="black", lw=1))
-    plt.plot(df['lat'], p(df['lat']), "--", label="Trend Line", color="red")
-    plt.legend()
-
-    plt.scatter(df['lat'], df['avg_temp'], color="red")
-    plt.xlabel("Latitude")
-    plt.ylabel("Average Monthly Temperature (ºC)")
-    plt.title(f"Latitude vs Average Monthly Temperature")
-    plt.grid()
-    plt.savefig(filenames['temp'])
-    plt.close()
-
-    filenames['sun'] = f"{GRAPH_OUTPUT_DIR}/lat_sun_correlation.png"
-
-    z = np.polyfit(df['lat'], df['avg_sun'], 1)
-    p = np.poly1d(z)
-    hours_per_degree = z[0]
-    plt.annotate(f"Trend: {hours_per_degree:.2f} hours/degree", xy=(0.05, 0.95), xycoords='axes fraction',
-                 fontsize=10, ha='left', va='top',
-                 bbox=dict(boxstyle="round,pad=0.3", fc="white", ec="black", lw=1))
-    plt.plot(df['lat'], p(df['lat']), "--", label="Trend Line", color="red")
-    plt.legend()
-
-    plt.scatter(df['lat'], df['avg_sun'], color="orange")
-    plt.xlabel("Latitude")
-    plt.ylabel("Average Monthly Sunshine (hours)")
-    plt.title(f"Latitude vs Average Monthly Sunshine")
-    plt.grid()
-    plt.savefig(filenames['sun'])
-    plt.close()
-
-    return filenames
\ No newline at end of file
+
+    return {key: save_chart("latitude", key, df=df) for key in CHARTS["latitude"]}
+
+# Image Rendering #
+# Graphs encoded straight to bytes for the API's image endpoints, without
+# touching GRAPH_OUTPUT_DIR. Recent images are kept in a bounded LRU.
+
+IMAGE_FORMATS = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+    "webp": "image/webp",
+}
+
+# In-memory image cache limits
+IMAGE_CACHE_MAX_ENTRIES = 1000
+IMAGE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+class ImageCache:
+    """
+    LRU cache of encoded images, keyed by graph and encoding options.
+    Like RenderCache, entries are only returned for the data version they
+    were rendered from.
+    """
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (version, data)
+        self.num_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, version):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] == version:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, key, version, data):
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.num_bytes -= self.size(old[1])
+            self.entries[key] = (version, data)
+            self.num_bytes += self.size(data)
+
+            while len(self.entries) > 1 and (
+                    len(self.entries) > self.max_entries or self.num_bytes > self.max_bytes):
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.num_bytes -= self.size(evicted)
+                self.evictions += 1
+
+    def size(self, data):
+        return len(data)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.num_bytes = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes": self.num_bytes,
+            }
+
+image_cache = ImageCache(IMAGE_CACHE_MAX_ENTRIES, IMAGE_CACHE_MAX_BYTES)
+
+def image_key(group, graph, args=(), fmt="png", width=640, height=480, dpi=100):
+    return (group, graph, tuple(args), fmt, width, height, dpi)
+
+def image_etag(key, version, database_id):
+    """
+    ETag for an image: the database id and data version plus a digest of
+    the graph and encoding options, so it can be checked without rendering.
+    """
+    digest = hashlib.sha1(repr(key).encode()).hexdigest()[:16]
+    return f'"{database_id:x}-v{version}-{digest}"'
+
+def figure_bytes(fig, fmt="png", width=640, height=480, dpi=100):
+    """
+    Encodes a figure at width x height pixels in memory.
+    """
+    fig.set_size_inches(width / dpi, height / dpi)
+    buffer = BytesIO()
+    with metrics.timer(PLOT_SAVEFIG_SECONDS, plot=getattr(_current_plot, "name", None) or "unknown"):
+        fig.savefig(buffer, format=fmt, dpi=dpi)
+    return buffer.getvalue()
+
+def render_image_uncached(group, graph, args=(), fmt="png", width=640, height=480, dpi=100):
+    """
+    Draws and encodes a graph. Returns the image bytes, or None if its
+    data couldn't be fetched.
+    """
+    name = f"image_{group}_{graph}"
+    _current_plot.name = name
+    try:
+        with metrics.timer(PLOT_RENDER_SECONDS, plot=name):
+            if group == "map":
+                fig = map_figure(graph, *args)
+            else:
+                fig = chart_figure(group, graph, *args)
+            if fig is None:
+                return None
+            return figure_bytes(fig, fmt, width, height, dpi)
+    finally:
+        _current_plot.name = None
+
+def _render_image_worker(key):
+    with metrics.capture() as observations:
+        data = render_image_uncached(*key)
+    return data, observations
+
+async def render_image(group, graph, args=(), fmt="png", width=640, height=480, dpi=100):
+    """
+    Returns (image bytes or None, data version), from the image cache or
+    drawn in the render pool.
+    """
+    key = image_key(group, graph, args, fmt, width, height, dpi)
+    version = await asyncio.to_thread(db.get_data_version)
+
+    data = image_cache.get(key, version)
+    if data is not None:
+        return data, version
+
+    future = get_render_pool().submit(_render_image_worker, key)
+    data, observations = await asyncio.wrap_future(future)
+    metrics.replay(observations)
+    if data is not None:
+        image_cache.put(key, version, data)
+    return data, version
+
+# Climate Maps #
+# Per-station averages of a metric, optionally over a window of years,
+# interpolated onto a regular UK grid by spatial.idw_grid(). Grids are
+# kept as float32 arrays in a bounded LRU, keyed by metric, window and
+# resolution, for the data version they were built from.
+MAP_METRICS = {
+    # metric: colour map
+    "temp": "RdYlBu_r",
+    "rain": "Blues",
+    "sun": "YlOrBr",
+}
+MAP_RESOLUTION = 0.1  # degrees
+
+# Grid cache limits
+GRID_CACHE_MAX_ENTRIES = 64
+GRID_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+class ClimateGrid:
+    __slots__ = ("metric", "start_year", "end_year", "lats", "lons", "values", "stations", "version")
+
+    def __init__(self, metric, start_year, end_year, lats, lons, values, stations, version):
+        self.metric = metric
+        self.start_year = start_year
+        self.end_year = end_year
+        self.lats = lats
+        self.lons = lons
+        self.values = values
+        self.stations = stations  # [(Station, value)] interpolated from
+        self.version = version
+
+class GridCache(ImageCache):
+    """
+    LRU cache of ClimateGrids, sized by their arrays.
+    """
+    def size(self, data):
+        return data.values.nbytes
+
+grid_cache = GridCache(GRID_CACHE_MAX_ENTRIES, GRID_CACHE_MAX_BYTES)
+
+def climate_grid(metric="temp", start_year=None, end_year=None, resolution=MAP_RESOLUTION):
+    """
+    Returns a ClimateGrid of a metric's average monthly value, from every
+    station's mean between start_year and end_year, or None on error.
+    Raises ValueError for an unknown metric.
+    """
+    if metric not in MAP_METRICS:
+        raise ValueError(f"Unknown metric '{metric}', expected one of {', '.join(MAP_METRICS)}")
+
+    key = (metric, start_year, end_year, resolution)
+    version = db.get_data_version()
+
+    grid = grid_cache.get(key, version)
+    if grid is not None:
+        return grid
+
+    means = rank_stations(metric, "mean", start_year=start_year, end_year=end_year)
+    if means is None:
+        return None
+    means = [(station, value) for station, value in means if station.lat is not None and station.lon is not None]
+
+    lats, lons, values = spatial.idw_grid(
+        [station.lat for station, _ in means],
+        [station.lon for station, _ in means],
+        [value for _, value in means],
+        resolution=resolution)
+
+    grid = ClimateGrid(metric, start_year, end_year, lats, lons, values, means, version)
+    grid_cache.put(key, version, grid)
+    return grid
+
+def map_figure(metric, start_year=None, end_year=None, resolution=MAP_RESOLUTION):
+    """
+    Draws a climate_grid() as a heatmap with its stations marked.
+    Returns the Figure, or None if the data couldn't be fetched.
+    """
+    grid = climate_grid(metric, start_year, end_year, resolution)
+
+    if grid is None:
+        print("Error fetching climate map data.")
+        return
+
+    label, unit = RANK_METRICS[metric]
+    window = ""
+    if start_year is not None or end_year is not None:
+        window = f", {start_year or ''}-{end_year or ''}"
+
+    fig = Figure()
+    ax = fig.subplots()
+    mesh = ax.pcolormesh(grid.lons, grid.lats, grid.values, shading='nearest', cmap=MAP_METRICS[metric],
+                         rasterized=True)
+    ax.scatter([station.lon for station, _ in grid.stations], [station.lat for station, _ in grid.stations],
+               s=4, color="black")
+    fig.colorbar(mesh, ax=ax, label=f"{label} ({unit})")
+
+    # Degrees of longitude shrink with latitude
+    ax.set_aspect(1 / np.cos(np.radians(grid.lats.mean())))
+    ax.set_xlabel("Longitude")
+    ax.set_ylabel("Latitude")
+    ax.set_title(f"Average Monthly {label}{window}")
+
+    return fig
+
+# Query Plans #
+def explain_queries():
+    """
+    Runs each query-issuing analysis function against SQL and prints the
+    EXPLAIN QUERY PLAN of every distinct query. Full scans of the
+    observations table, whose cost grows with the history, are marked.
+    Scans of the summary and stations tables are expected.
+    """
+    global USE_STORE
+    registry = get_station_registry()
+    if not registry or not registry.by_id:
+        print("No stations to explain queries for.")
+        return
+    station_id = next(iter(registry.by_id))
+
+    calls = [
+        lambda: station_temp_trend_series(station_id),
+        lambda: station_monthly_series(station_id),
+        overall_yearly_series,
+        overall_monthly_series,
+        latitude_series,
+        lambda: station_avg_rain(station_id),
+        lambda: station_avg_temp(station_id),
+        lambda: station_anomaly_series(station_id),
+        overall_anomaly_series,
+        # The reads of an incremental anomaly update, without its writes
+        lambda: anomalies._changed_inputs(full=False),
+        lambda: anomalies.read_observations([station_id]),
+        lambda: StationRegistry.load(),
+        lambda: StationTrends.load(),
+        lambda: climate_grid("temp", start_year=1961, end_year=1990),
+    ]
+    for statistic in RANK_STATISTICS:
+        calls.append(lambda statistic=statistic: rank_stations("temp", statistic))
+        calls.append(lambda statistic=statistic: rank_stations("rain", statistic, start_year=1961, end_year=1990))
+        calls.append(lambda statistic=statistic: rank_stations("sun", statistic, months=[6, 7, 8]))
+
+    # Rankings by max read the store, which loads once per data version, and
+    # the anomaly series bring the anomalies up to date first
+    store.get_store()
+    anomalies.ensure_current()
+
+    use_store, USE_STORE = USE_STORE, False
+    try:
+        with db.capture_queries() as queries:
+            for call in calls:
+                call()
+    finally:
+        USE_STORE = use_store
+
+    seen = set()
+    full_scans = 0
+    for query, params in queries:
+        if query in seen:
+            continue
+        seen.add(query)
+
+        print("-"*60)
+        print(" ".join(query.split()))
+        for detail in db.explain(query, params) or []:
+            # SCAN (unlike SEARCH) reads the whole table or index
+            full_scan = detail.startswith("SCAN observations")
+            full_scans += full_scan
+            print(f"    {detail}{'    <-- full scan' if full_scan else ''}")
+
+    print("-"*60)
+    print(f"{len(seen)} queries, {full_scans} full scan(s) of observations")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rank stations by a weather statistic.")
+    parser.add_argument("--metric", default="temp", choices=RANK_METRICS)
+    parser.add_argument("--stat", default="mean", choices=RANK_STATISTICS)
+    parser.add_argument("--start-year", type=int)
+    parser.add_argument("--end-year", type=int)
+    parser.add_argument("--month", type=int, action="append", dest="months",
+                        help="limit to a month (1-12), may be repeated")
+    parser.add_argument("--top", type=int)
+    parser.add_argument("--asc", action="store_true", help="lowest first")
+    parser.add_argument("--explain", action="store_true",
+                        help="print the query plan of every analysis query instead")
+    args = parser.parse_args()
+
+    if args.explain:
+        explain_queries()
+        exit()
+
+    print_station_ranking(
+        args.metric, args.stat, desc=not args.asc,
+        start_year=args.start_year, end_year=args.end_year,
+        months=args.months, top=args.top)
@@ -0,0 +1,214 @@
+import argparse
+import threading
+
+import numpy as np
+
+import src.database as db
+
+'''
+Climatology baselines and monthly anomalies.
+
+A station's climatology is the mean of each metric for each calendar month
+over a baseline period of years (1961-1990 by default); an observation's
+anomaly is its value minus its station and month's climatology. compute()
+does both in one vectorized pass over observation arrays.
+
+Results are persisted in the climatology, anomalies and agg_anomaly tables
+and updated incrementally: anomaly_inputs holds the agg_station_year rows
+they were computed from, so only station years whose rows have changed
+since are recomputed, and a station's other years only when its baseline
+years changed. Changing the baseline recomputes everything.
+
+    python -m src.anomalies [--baseline 1961 1990] [--full]
+'''
+
+METRICS = list(db.AGGREGATE_METRICS)
+BASELINE = (1961, 1990)
+# Fewer baseline values than this for a station and month leave it without
+# a climatology, and its anomalies missing
+BASELINE_MIN_YEARS = 10
+# Updates touching more stations than this read the whole table
+MAX_STATION_PARAMS = 500
+
+_update_lock = threading.Lock()
+
+def compute(station_id, year, month, values, baseline=BASELINE, min_years=BASELINE_MIN_YEARS):
+    """
+    values is a (rows, len(METRICS)) array, with NaN for missing values.
+    Returns (stations, means, counts, anomalies): the sorted station ids,
+    (stations, 12, metrics) arrays of baseline means (NaN with fewer than
+    min_years values) and value counts, and each row's anomalies.
+    """
+    stations, index = np.unique(station_id, return_inverse=True)
+    cells = index * 12 + (np.asarray(month, dtype=np.int64) - 1)
+    size = len(stations) * 12 * len(METRICS)
+
+    # One bincount over every (station, month, metric) cell of the baseline
+    in_baseline = (year >= baseline[0]) & (year <= baseline[1])
+    valid = in_baseline[:, None] & ~np.isnan(values)
+    bins = cells[:, None] * len(METRICS) + np.arange(len(METRICS))
+    counts = np.bincount(bins[valid], minlength=size)
+    sums = np.bincount(bins[valid], weights=values[valid], minlength=size)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(counts >= min_years, sums / counts, np.nan)
+    means = means.reshape(-1, len(METRICS))
+    anomalies = values - means[cells]
+
+    shape = (len(stations), 12, len(METRICS))
+    return stations, means.reshape(shape), counts.reshape(shape), anomalies
+
+def read_observations(station_ids=None):
+    """
+    Returns (station_id, year, month, values) arrays of every observation,
+    or only those of station_ids, or None on error.
+    """
+    station_ids = None if station_ids is None else list(station_ids)
+    where = ""
+    params = ()
+    if station_ids is not None and len(station_ids) <= MAX_STATION_PARAMS:
+        where = f"WHERE station_id IN ({', '.join('?' * len(station_ids))})"
+        params = tuple(station_ids)
+
+    query = f"""
+    SELECT station_id, year, month, tmax, tmin, af, rain, sun
+    FROM observations
+    {where}
+    ORDER BY station_id, year, month;
+    """
+    data = db.select(query, params, name="anomalies.observations")
+    if data is None:
+        return None
+    rows = np.array(data, dtype=float).reshape(-1, 8)
+    if station_ids is not None and not where:
+        rows = rows[np.isin(rows[:, 0], station_ids)]
+
+    tmax, tmin, af, rain, sun = rows[:, 3:].T
+    columns = {"tmax": tmax, "tmin": tmin, "temp": (tmax + tmin) / 2.0, "af": af, "rain": rain, "sun": sun}
+    values = np.column_stack([columns[metric] for metric in METRICS])
+    return rows[:, 0].astype(np.int64), rows[:, 1].astype(np.int64), rows[:, 2].astype(np.int64), values
+
+def _nullable(values):
+    """
+    Returns a 2D float array as a list of rows, with None for NaN.
+    """
+    rows = values.astype(object)
+    rows[np.isnan(values)] = None
+    return rows.tolist()
+
+def get_baseline():
+    """
+    Returns the (start, end) years of the persisted baseline, or BASELINE
+    if anomalies haven't been computed yet.
+    """
+    baseline = (db.get_version('baseline_start'), db.get_version('baseline_end'))
+    return baseline if baseline[0] else BASELINE
+
+def _changed_inputs(full):
+    """
+    Returns (inputs, keys): the agg_station_year rows that are new or
+    changed since the last update (all of them if full), and the
+    (station_id, year) keys of those plus any since removed.
+    """
+    if full:
+        inputs = db.select(
+            "SELECT * FROM agg_station_year ORDER BY station_id, year;", name="anomalies.inputs")
+        removed = []
+    else:
+        inputs = db.select("""
+        SELECT * FROM agg_station_year
+        EXCEPT
+        SELECT * FROM anomaly_inputs;
+        """, name="anomalies.changed_inputs")
+        removed = db.select("""
+        SELECT station_id, year FROM anomaly_inputs
+        EXCEPT
+        SELECT station_id, year FROM agg_station_year;
+        """, name="anomalies.removed_inputs")
+    if inputs is None or removed is None:
+        return None, None
+    return inputs, [(row[0], row[1]) for row in inputs] + [tuple(row) for row in removed]
+
+def update_anomalies(baseline=None, full=False):
+    """
+    Brings the persisted climatology and anomalies up to date with the
+    observations, for baseline (default: the persisted one). Returns the
+    number of anomaly rows written, or None on error.
+    """
+    with _update_lock:
+        # The anomalies are stamped with the version read before any inputs, so
+        # if a scrape lands mid-update, ensure_current still sees them as behind
+        version = db.get_data_version()
+        baseline = tuple(baseline or get_baseline())
+        full = full or baseline != get_baseline() or db.get_version('anomalies_version') < 0
+
+        inputs, keys = _changed_inputs(full)
+        if inputs is None:
+            return None
+
+        stations = sorted({station_id for station_id, _ in keys})
+        rebaselined = sorted({
+            station_id for station_id, year in keys if baseline[0] <= year <= baseline[1]
+        })
+
+        if stations:
+            observations = read_observations(None if full else stations)
+            if observations is None:
+                return None
+        else:
+            observations = (*(np.empty(0, dtype=np.int64) for _ in range(3)), np.empty((0, len(METRICS))))
+        station_id, year, month, values = observations
+        ids, means, counts, anomalies = compute(station_id, year, month, values, baseline)
+        ids = ids.tolist()
+
+        # Write the anomalies of changed years, and of every year of stations
+        # whose climatology changed
+        row_keys = station_id * 10000 + year
+        changed = np.array([s * 10000 + y for s, y in keys], dtype=np.int64)
+        write = np.isin(row_keys, changed) | np.isin(station_id, rebaselined) if not full else slice(None)
+        written = np.unique(row_keys[write])
+        station_years = [(int(k // 10000), int(k % 10000)) for k in written] + keys
+
+        # Rows of (station_id, month, then mean and count per metric)
+        climatology = [
+            (ids[cell // 12], cell % 12 + 1, *[v for pair in zip(mean, count) for v in pair])
+            for cell, (mean, count) in enumerate(zip(
+                _nullable(means.reshape(-1, len(METRICS))),
+                counts.reshape(-1, len(METRICS)).tolist()))
+        ]
+
+        anomaly_rows = [
+            (s, y, m, *a) for s, y, m, a in zip(
+                station_id[write].tolist(), year[write].tolist(), month[write].tolist(),
+                _nullable(anomalies[write]))
+        ]
+
+        return db.write_anomalies(
+            stations, climatology, station_years, anomaly_rows, inputs, keys,
+            baseline, version, full)
+
+def ensure_current():
+    """
+    Updates the anomalies if the data has changed since they were computed.
+    """
+    if db.get_version('anomalies_version') != db.get_data_version():
+        update_anomalies()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute climatology baselines and monthly anomalies.")
+    parser.add_argument("--baseline", type=int, nargs=2, metavar=("START", "END"),
+                        help=f"baseline years (default: the current one, or {BASELINE[0]} {BASELINE[1]})")
+    parser.add_argument("--full", action="store_true", help="recompute every station")
+    args = parser.parse_args()
+
+    db.create_tables()
+    try:
+        rows = update_anomalies(args.baseline, args.full)
+        start, end = get_baseline()
+    finally:
+        db.close_connections()
+
+    if rows is None:
+        print("Failed to update anomalies.")
+    else:
+        print(f"Wrote {rows} anomaly rows against the {start}-{end} baseline")
@@ -1,10 +1,57 @@
-from fastapi import FastAPI
+import time
+import asyncio
+from io import BytesIO
+from contextlib import asynccontextmanager
+
+from typing import List, Optional
+
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from starlette.concurrency import run_in_threadpool
+import numpy as np
 
 import src.analysis as analysis; 
-from src.analysis import Station
 import src.database as db
+import src.metrics as metrics
+import src.anomalies as anomalies
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    db.create_tables()
+    analysis.use_store()
+    yield
+    analysis.shutdown_render_pool()
+    db.close_connections()
+
+app = FastAPI(title="UK Weather Dashboard", lifespan=lifespan)
+
+# Metrics #
+REQUEST_SECONDS = metrics.Histogram(
+    "http_request_duration_seconds", "Time spent handling API requests.", ["method", "route", "status"])
+RENDER_CACHE = metrics.Gauge(
+    "render_cache", "Render cache counters and sizes.", ["stat"])
+DATA_VERSION = metrics.Gauge(
+    "data_version", "Current data version of the database.")
 
-app = FastAPI(title="UK Weather Dashboard")
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template (/station/{station_id}) rather than the raw path
+    route = request.scope.get("route")
+    REQUEST_SECONDS.observe(
+        time.perf_counter() - start,
+        method=request.method,
+        route=route.path if route else "unmatched",
+        status=response.status_code)
+    return response
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    for stat, value in analysis.render_cache.stats().items():
+        RENDER_CACHE.set(value, stat=stat)
+    DATA_VERSION.set(db.get_data_version())
+    return PlainTextResponse(metrics.exposition(), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 def root():
@@ -12,26 +59,117 @@ def root():
 
 @app.get("/stations")
 def get_stations():
-    stations = analysis.list_stations()
-    if stations is None:
+    registry = analysis.get_station_registry()
+    if not registry or not registry.by_id:
         return {"error": "Unable to get stations."}
     else:
         return {
-            "stations": [{"id": station.id, "name": station.name} for station in stations]
+            "stations": [{"id": station.id, "name": station.name} for station in registry.by_id.values()]
         }
 
+@app.get("/stations/nearby")
+def get_nearby_stations(
+        lat: float = Query(..., ge=-90, le=90),
+        lon: float = Query(..., ge=-180, le=180),
+        k: Optional[int] = Query(None, ge=1, le=1000),
+        radius_km: Optional[float] = Query(None, gt=0)):
+    """
+    The k nearest stations to a location (5 by default), or with
+    radius_km, the stations within that great-circle distance.
+    """
+    if radius_km is None:
+        nearby = analysis.nearest_stations(lat, lon, k or 5)
+    else:
+        nearby = analysis.stations_within(lat, lon, radius_km, k)
+
+    if nearby is None:
+        return {"error": "Unable to get stations."}
+
+    return {
+        "lat": lat,
+        "lon": lon,
+        "stations": [
+            {"id": station.id, "name": station.name, "lat": station.lat, "lon": station.lon,
+             "distance_km": round(distance, 3)}
+            for station, distance in nearby
+        ]
+    }
+
+@app.get("/rankings")
+def get_rankings(
+        metric: str = "temp",
+        stat: str = "mean",
+        start_year: Optional[int] = None,
+        end_year: Optional[int] = None,
+        month: Optional[List[int]] = Query(None),
+        top: Optional[int] = Query(None, ge=1),
+        desc: bool = True):
+    try:
+        ranking = analysis.rank_stations(
+            metric, stat, start_year=start_year, end_year=end_year,
+            months=month, top=top, desc=desc)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    if ranking is None:
+        return {"error": "Unable to rank stations."}
+
+    return {
+        "metric": metric,
+        "stat": stat,
+        "rankings": [
+            {"rank": i + 1, "id": station.id, "name": station.name, "value": value}
+            for i, (station, value) in enumerate(ranking)
+        ]
+    }
+
+@app.get("/trends")
+def get_trends(
+        metric: str = "temp",
+        top: Optional[int] = Query(None, ge=1),
+        desc: bool = True):
+    """
+    Stations ranked by the linear trend of a metric's yearly means, per
+    century, with the slope's standard error and the fit's R².
+    """
+    try:
+        ranking = analysis.rank_trends(metric, top=top, desc=desc)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    if ranking is None:
+        return {"error": "Unable to get trends."}
+
+    label, unit = analysis.RANK_METRICS[metric]
+    return {
+        "metric": metric,
+        "unit": f"{unit}/century",
+        "rankings": [
+            {"rank": i + 1, "id": station.id, "name": station.name, **trend}
+            for i, (station, trend) in enumerate(ranking)
+        ]
+    }
+
+async def render_all(plots):
+    """
+    Renders {key: (plot, *args)} concurrently, returning {key: file_name(s)}.
+    """
+    results = await asyncio.gather(
+        *(analysis.render(*plot) for plot in plots.values()))
+    return dict(zip(plots.keys(), results))
+
 @app.get("/station/{station_id}")
-def get_station_info(station_id: int):
+async def get_station_info(station_id: int):
 
-    station = Station(station_id)
-    if (not station.load_details()):
+    station = await run_in_threadpool(analysis.get_station, station_id)
+    if station is None:
         return {"error": "Station not found."}
 
-    filenames = {
-        'temp_trend': analysis.plot_station_temp_trend(station_id),
-        'monthly_rainfall': analysis.plot_station_monthly_rainfall(station_id),
-        'monthly_sunshine': analysis.plot_station_monthly_sunshine(station_id),
-    }
+    filenames = await render_all({
+        'temp_trend': (analysis.plot_station_temp_trend, station_id),
+        'monthly_rainfall': (analysis.plot_station_monthly_rainfall, station_id),
+        'monthly_sunshine': (analysis.plot_station_monthly_sunshine, station_id),
+    })
 
     return {
         "details": {
@@ -42,29 +180,261 @@ def get_station_info(station_id: int):
             "opened": station.opened,
             "data_url": station.url
         },
-        "graphs": filenames
+        "graphs": filenames,
+        "images": image_urls("station", station_id)
     }
 
 @app.get("/overall")
-def get_overall_info():
-    filenames = {
-        'avg_temp_trend': analysis.plot_overall_temp_trend(),
-        'avg_rain_trend': analysis.plot_overall_rainfall_trend(),
-        'avg_sunshine_trend': analysis.plot_overall_sunshine_trend(),
-
-        'total_temp': analysis.plot_overall_monthly_temp(),
-        'total_rainfall': analysis.plot_overall_monthly_rainfall(),
-        'total_sunshine': analysis.plot_overall_monthly_sunshine(),
-    }
+async def get_overall_info():
+    filenames = await render_all({
+        'avg_temp_trend': (analysis.plot_overall_temp_trend,),
+        'avg_rain_trend': (analysis.plot_overall_rainfall_trend,),
+        'avg_sunshine_trend': (analysis.plot_overall_sunshine_trend,),
+
+        'total_temp': (analysis.plot_overall_monthly_temp,),
+        'total_rainfall': (analysis.plot_overall_monthly_rainfall,),
+        'total_sunshine': (analysis.plot_overall_monthly_sunshine,),
+    })
 
     return {
-        "graphs": filenames
+        "graphs": filenames,
+        "images": image_urls("overall")
     }
 
 @app.get("/overall/latitude")
-def get_overall_latitude_info():
-    filenames = analysis.plot_lat_against()
+async def get_overall_latitude_info():
+    filenames = await analysis.render(analysis.plot_lat_against)
+
+    return {
+        "graphs": filenames,
+        "images": image_urls("latitude")
+    }
 
+@app.get("/cache/stats")
+def get_cache_stats():
     return {
-        "graphs": filenames
-    }
\ No newline at end of file
+        "render_cache": analysis.render_cache.stats(),
+        "render_manifest": analysis.render_manifest.stats(),
+        "image_cache": analysis.image_cache.stats(),
+        "grid_cache": analysis.grid_cache.stats()
+    }
+
+# Image Endpoints #
+# Graphs rendered in memory and returned as image bytes, e.g.
+# /images/station/12/temp_trend?format=svg&width=1200&height=800
+IMAGE_MAX_AGE = 300  # seconds clients may reuse an image before revalidating
+
+def image_urls(group, *args):
+    prefix = "/".join(["/images", group, *(str(arg) for arg in args)])
+    return {graph: f"{prefix}/{graph}" for graph in analysis.CHARTS[group]}
+
+async def image_response(request, group, graph, args, fmt, width, height, dpi):
+    graphs = analysis.MAP_METRICS if group == "map" else analysis.CHARTS[group]
+    if graph not in graphs:
+        return JSONResponse({"error": "Graph not found."}, status_code=404)
+
+    key = analysis.image_key(group, graph, args, fmt, width, height, dpi)
+    database_id, version = await run_in_threadpool(data_key)
+    etag = analysis.image_etag(key, version, database_id)
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={IMAGE_MAX_AGE}"}
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    data, version = await analysis.render_image(group, graph, args, fmt, width, height, dpi)
+    if data is None:
+        return JSONResponse({"error": "Unable to render graph."}, status_code=500)
+
+    # The data may have changed while rendering
+    headers["ETag"] = analysis.image_etag(key, version, database_id)
+    return Response(content=data, media_type=analysis.IMAGE_FORMATS[fmt], headers=headers)
+
+IMAGE_FORMAT = Query("png", pattern="^(png|svg|webp)$")
+IMAGE_WIDTH = Query(640, ge=100, le=4000)
+IMAGE_HEIGHT = Query(480, ge=100, le=4000)
+IMAGE_DPI = Query(100, ge=50, le=300)
+
+@app.get("/images/station/{station_id}/{graph}")
+async def get_station_image(
+        station_id: int, graph: str, request: Request,
+        format: str = IMAGE_FORMAT, width: int = IMAGE_WIDTH,
+        height: int = IMAGE_HEIGHT, dpi: int = IMAGE_DPI):
+    if await run_in_threadpool(analysis.get_station, station_id) is None:
+        return JSONResponse({"error": "Station not found."}, status_code=404)
+    return await image_response(request, "station", graph, (station_id,), format, width, height, dpi)
+
+@app.get("/images/overall/{graph}")
+async def get_overall_image(
+        graph: str, request: Request,
+        format: str = IMAGE_FORMAT, width: int = IMAGE_WIDTH,
+        height: int = IMAGE_HEIGHT, dpi: int = IMAGE_DPI):
+    return await image_response(request, "overall", graph, (), format, width, height, dpi)
+
+@app.get("/images/latitude/{graph}")
+async def get_latitude_image(
+        graph: str, request: Request,
+        format: str = IMAGE_FORMAT, width: int = IMAGE_WIDTH,
+        height: int = IMAGE_HEIGHT, dpi: int = IMAGE_DPI):
+    return await image_response(request, "latitude", graph, (), format, width, height, dpi)
+
+MAP_RESOLUTION = Query(analysis.MAP_RESOLUTION, ge=0.05, le=1.0)
+
+@app.get("/images/map/{metric}")
+async def get_map_image(
+        metric: str, request: Request,
+        start_year: Optional[int] = None, end_year: Optional[int] = None,
+        resolution: float = MAP_RESOLUTION,
+        format: str = IMAGE_FORMAT, width: int = IMAGE_WIDTH,
+        height: int = IMAGE_HEIGHT, dpi: int = IMAGE_DPI):
+    return await image_response(
+        request, "map", metric, (start_year, end_year, resolution), format, width, height, dpi)
+
+# Data Endpoints #
+# The series behind each graph as columnar JSON. Responses carry an ETag
+# of the database id and data version (and for anomalies, the baseline),
+# so clients can poll with If-None-Match and get a 304 until the scraper
+# next writes data.
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+def data_key():
+    """
+    Returns (database id, data version).
+    """
+    return db.get_database_id(), db.get_data_version()
+
+def data_etag():
+    """
+    ETag for data of the current data version of this database.
+    """
+    database_id, version = data_key()
+    return f'"{database_id:x}-v{version}"'
+
+def anomaly_etag():
+    """
+    ETag for anomaly data: data_etag() plus the baseline, since a new
+    baseline rewrites the anomalies without a new data version.
+    """
+    start, end = anomalies.get_baseline()
+    return f'{data_etag()[:-1]}-b{start}-{end}"'
+
+def data_response(request: Request, build, etag=data_etag):
+    """
+    Returns build()'s data as JSON, or 304 Not Modified if the client
+    already has the current data, as identified by etag().
+    """
+    etag = etag()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    data = build()
+    if data is None:
+        return {"error": "Unable to get data."}
+    return JSONResponse(data, headers=headers)
+
+def station_data_response(request: Request, station_id, build, etag=data_etag):
+    """
+    data_response for one station's data, or 404 if there's no such station.
+    """
+    if analysis.get_station(station_id) is None:
+        return JSONResponse({"error": "Station not found."}, status_code=404)
+    return data_response(request, build, etag)
+
+def series_data(df, trend_columns=()):
+    if df is None:
+        return None
+    data = analysis.to_columns(df)
+    if trend_columns:
+        data["trends"] = analysis.trend_coefficients(df, trend_columns)
+    return data
+
+@app.get("/data/station/{station_id}/temp_trend")
+def get_station_temp_trend_data(station_id: int, request: Request):
+    return station_data_response(request, station_id, lambda: series_data(
+        analysis.station_temp_trend_series(station_id), ['avg_temp', 'avg_tmax', 'avg_tmin']))
+
+@app.get("/data/station/{station_id}/monthly")
+def get_station_monthly_data(station_id: int, request: Request):
+    return station_data_response(request, station_id, lambda: series_data(
+        analysis.station_monthly_series(station_id)))
+
+def anomaly_data(df):
+    data = series_data(df)
+    if data is not None:
+        data["baseline"] = list(anomalies.get_baseline())
+    return data
+
+@app.get("/data/station/{station_id}/anomalies")
+def get_station_anomaly_data(station_id: int, request: Request):
+    return station_data_response(request, station_id, lambda: anomaly_data(
+        analysis.station_anomaly_series(station_id)), anomaly_etag)
+
+@app.get("/data/overall/trends")
+def get_overall_trend_data(request: Request):
+    return data_response(request, lambda: series_data(
+        analysis.overall_yearly_series(), ['avg_temp', 'avg_rain', 'avg_sun']))
+
+@app.get("/data/overall/monthly")
+def get_overall_monthly_data(request: Request):
+    return data_response(request, lambda: series_data(
+        analysis.overall_monthly_series()))
+
+@app.get("/data/overall/anomalies")
+def get_overall_anomaly_data(request: Request):
+    return data_response(request, lambda: anomaly_data(
+        analysis.overall_anomaly_series()), anomaly_etag)
+
+@app.get("/data/overall/latitude")
+def get_overall_latitude_data(request: Request):
+    return data_response(request, lambda: series_data(
+        analysis.latitude_series(), ['avg_rain', 'avg_temp', 'avg_sun']))
+
+@app.get("/data/map/{metric}")
+def get_map_data(
+        metric: str, request: Request,
+        start_year: Optional[int] = None, end_year: Optional[int] = None,
+        resolution: float = MAP_RESOLUTION,
+        format: str = Query("json", pattern="^(json|npy)$")):
+    """
+    The interpolated grid behind /images/map/{metric}: grid point lats and
+    lons, and values[lat][lon] (null outside the stations' range). With
+    format=npy, just the values as a float32 .npy array.
+    """
+    if metric not in analysis.MAP_METRICS:
+        return JSONResponse({"error": "Metric not found."}, status_code=404)
+
+    etag = data_etag()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    grid = analysis.climate_grid(metric, start_year, end_year, resolution)
+    if grid is None:
+        return {"error": "Unable to get data."}
+
+    if format == "npy":
+        buffer = BytesIO()
+        np.save(buffer, grid.values)
+        headers.update({
+            "X-Grid-Lats": f"{grid.lats[0]:.4f},{grid.lats[-1]:.4f},{len(grid.lats)}",
+            "X-Grid-Lons": f"{grid.lons[0]:.4f},{grid.lons[-1]:.4f},{len(grid.lons)}",
+        })
+        return Response(content=buffer.getvalue(), media_type="application/octet-stream", headers=headers)
+
+    values = grid.values.astype(float).round(3).astype(object)
+    values[np.isnan(grid.values)] = None
+    return JSONResponse({
+        "metric": metric,
+        "start_year": start_year,
+        "end_year": end_year,
+        "resolution": resolution,
+        "stations": len(grid.stations),
+        "lat": np.round(grid.lats, 4).tolist(),
+        "lon": np.round(grid.lons, 4).tolist(),
+        "values": values.tolist(),
+    }, headers=headers)
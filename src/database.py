@@ -1,7 +1,14 @@
+import os
+import time
+import secrets
 import sqlite3
+import threading
+from contextlib import contextmanager
 
 from typing import List, Tuple, Any, Optional
 
+import src.metrics as metrics
+
 DATABASE_NAME = "historic_station_data"
 '''
 Column Information:
@@ -12,16 +19,89 @@ rain - Total rainfal (mm)
 sun - Total sunshine duration (hours)
 '''
 
+# Connection settings
+STATEMENT_CACHE_SIZE = 256          # prepared statements kept per connection
+CACHE_SIZE_KB = 64 * 1024           # page cache per connection
+MMAP_SIZE = 256 * 1024 * 1024       # bytes of the database file to memory-map
+
 def connect():
-    conn = sqlite3.connect(f"{DATABASE_NAME}.db")
+    """
+    Opens a new connection with the tuned pragmas applied.
+    Prefer get_connection() / get_writer(), which reuse connections.
+    """
+    conn = sqlite3.connect(
+        f"{DATABASE_NAME}.db",
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=False)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
+
+# Connection Management #
+# Each thread (e.g. a FastAPI worker) keeps its own long-lived read
+# connection, while all writes go through a single writer connection.
+_local = threading.local()
+_writer = None
+_writer_lock = threading.RLock()
+_connections = []
+_connections_lock = threading.Lock()
+_generation = 0  # bumped by close_connections() to retire cached connections
+
+def _open():
+    conn = connect()
+    with _connections_lock:
+        _connections.append(conn)
     return conn
 
+def _connection_key():
+    return (DATABASE_NAME, _generation)
+
+def get_connection():
+    """
+    Returns this thread's read connection, opening it on first use.
+    """
+    if getattr(_local, "key", None) != _connection_key():
+        _local.conn = _open()
+        _local.key = _connection_key()
+    return _local.conn
+
+def get_writer():
+    """
+    Returns the shared writer connection. Hold _writer_lock while using it.
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None or _writer[0] != _connection_key():
+            _writer = (_connection_key(), _open())
+        return _writer[1]
+
+def close_connections():
+    """
+    Closes every connection opened by this module, e.g. on shutdown or
+    after changing DATABASE_NAME.
+    """
+    global _writer, _generation
+    with _writer_lock, _connections_lock:
+        for conn in _connections:
+            try:
+                conn.execute("PRAGMA optimize")
+            except sqlite3.Error:
+                pass
+            conn.close()
+        _connections.clear()
+        _writer = None
+        _generation += 1
+
 # Setup #
 def create_tables():
-    conn = connect()
-    cur = conn.cursor()
+    with _writer_lock:
+        conn = get_writer()
+        cur = conn.cursor()
 
-    cur.execute("""
+        cur.execute("""
 CREATE TABLE IF NOT EXISTS stations (
     id          INTEGER PRIMARY KEY AUTOINCREMENT,
     name        TEXT NOT NULL UNIQUE,
@@ -32,7 +112,7 @@ CREATE TABLE IF NOT EXISTS stations (
 )
 """)
     
-    cur.execute("""
+        cur.execute("""
 CREATE TABLE IF NOT EXISTS observations (
     station_id  INTEGER NOT NULL,
     year        INTEGER NOT NULL,
@@ -46,60 +126,516 @@ CREATE TABLE IF NOT EXISTS observations (
     FOREIGN KEY (station_id) REFERENCES stations(id)
 )
 """)
+
+        # Cache validators for each station's data file, used to skip
+        # unchanged files on the next scrape
+        cur.execute("""
+CREATE TABLE IF NOT EXISTS station_files (
+    station_id      INTEGER PRIMARY KEY,
+    etag            TEXT,
+    last_modified   TEXT,
+    content_hash    TEXT,
+    fetched_at      TEXT,
+    FOREIGN KEY (station_id) REFERENCES stations(id)
+)
+""")
+
+        # Key/value metadata, e.g. the data version bumped on every ingest
+        cur.execute("""
+CREATE TABLE IF NOT EXISTS metadata (
+    key         TEXT PRIMARY KEY,
+    value       INTEGER
+)
+""")
+        cur.execute("""
+        INSERT OR IGNORE INTO metadata (key, value)
+        VALUES ('data_version', 0), ('stations_version', 0),
+            ('anomalies_version', -1), ('baseline_start', 0), ('baseline_end', 0)
+        """)
+        # A random id for this database, as data versions restart from 0 in
+        # every new one: snapshots, manifests and ETags record both
+        cur.execute("""
+        INSERT OR IGNORE INTO metadata (key, value) VALUES ('database_id', ?)
+        """, (secrets.randbits(62),))
+
+        # Summary tables of per-metric sums and non-null counts
+        for table, keys in AGGREGATE_TABLES.items():
+            key_columns = ", ".join(f"{key} INTEGER NOT NULL" for key in keys)
+            cur.execute(f"""
+CREATE TABLE IF NOT EXISTS {table} (
+    {key_columns},
+    {_aggregate_columns()},
+    PRIMARY KEY ({", ".join(keys)})
+)
+""")
+
+        # Climatology baselines and monthly anomalies, maintained by src/anomalies.py.
+        # anomaly_inputs is a copy of the agg_station_year rows they were
+        # computed from, so changed station years can be found by comparison.
+        cur.execute(f"""
+CREATE TABLE IF NOT EXISTS climatology (
+    station_id  INTEGER NOT NULL,
+    month       INTEGER NOT NULL,
+    {_climatology_columns()},
+    PRIMARY KEY (station_id, month)
+)
+""")
+        cur.execute(f"""
+CREATE TABLE IF NOT EXISTS anomalies (
+    station_id  INTEGER NOT NULL,
+    year        INTEGER NOT NULL,
+    month       INTEGER NOT NULL,
+    {", ".join(f"{metric} REAL" for metric in AGGREGATE_METRICS)},
+    PRIMARY KEY (station_id, year, month)
+)
+""")
+        cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_anomalies_year
+        ON anomalies (year)
+        """)
+        for table, keys in ANOMALY_TABLES.items():
+            key_columns = ", ".join(f"{key} INTEGER NOT NULL" for key in keys)
+            cur.execute(f"""
+CREATE TABLE IF NOT EXISTS {table} (
+    {key_columns},
+    {_aggregate_columns()},
+    PRIMARY KEY ({", ".join(keys)})
+)
+""")
+
+        # Fill the summary tables for databases scraped before they existed
+        cur.execute("SELECT EXISTS (SELECT 1 FROM observations)")
+        has_observations = cur.fetchone()[0]
+        cur.execute("SELECT EXISTS (SELECT 1 FROM agg_station)")
+        has_aggregates = cur.fetchone()[0]
+        if has_observations and not has_aggregates:
+            _rebuild_aggregates(cur)
+
+        _migrate(cur)
     
-    conn.commit()
-    conn.close()
+        conn.commit()
+
+# Schema migrations, applied in order by create_tables. The database's
+# PRAGMA user_version records how many have been applied, so a migration
+# must never change once released: append a new one instead.
+MIGRATIONS = [
+    # 1: index for rolling agg_station_year up by year
+    [
+        """
+        CREATE INDEX IF NOT EXISTS idx_agg_station_year_year
+        ON agg_station_year (year)
+        """,
+        "ANALYZE",
+    ],
+]
+
+def _migrate(cur):
+    cur.execute("PRAGMA user_version")
+    version = cur.fetchone()[0]
+
+    for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+        for statement in statements:
+            cur.execute(statement)
+        cur.execute(f"PRAGMA user_version = {number}")
+        print(f"Applied database migration {number}")
+
+def _bump_version(cur, key):
+    cur.execute("""
+    UPDATE metadata SET value = value + 1 WHERE key = ?
+    """, (key,))
+
+def _bump_data_version(cur):
+    _bump_version(cur, 'data_version')
+
+# Aggregates #
+# Each summary table holds, per key, the sum and non-null count of every
+# metric, so averages are sum / count without scanning observations.
+# They are kept up to date in the same transaction as observation writes.
+AGGREGATE_METRICS = {
+    "tmax": "tmax",
+    "tmin": "tmin",
+    "temp": "(tmax + tmin) / 2.0",
+    "af": "af",
+    "rain": "rain",
+    "sun": "sun",
+}
+
+AGGREGATE_TABLES = {
+    "agg_station_year": ("station_id", "year"),
+    "agg_station_month": ("station_id", "month"),
+    "agg_station": ("station_id",),
+    "agg_year": ("year",),
+    "agg_month": ("month",),
+}
+
+ANOMALY_TABLES = {
+    "anomaly_inputs": ("station_id", "year"),
+    "agg_anomaly": ("year", "month"),
+}
+
+def _climatology_columns():
+    return ",\n    ".join(
+        f"{metric}_mean REAL, {metric}_n INTEGER" for metric in AGGREGATE_METRICS)
+
+def _aggregate_columns():
+    return ",\n    ".join(
+        f"{metric}_sum REAL, {metric}_n INTEGER" for metric in AGGREGATE_METRICS)
+
+def _aggregate_select():
+    """
+    Sums and counts of each metric over observations rows.
+    """
+    return ", ".join(
+        f"SUM({expr}), COUNT({expr})" for expr in AGGREGATE_METRICS.values())
+
+def _rollup_select():
+    """
+    Sums and counts of each metric over rows of another summary table.
+    """
+    return ", ".join(
+        f"SUM({metric}_sum), SUM({metric}_n)" for metric in AGGREGATE_METRICS)
+
+def _refresh_aggregates(cur, station_id, years):
+    """
+    Recomputes the summary rows affected by writes to a station's
+    observations in the given years.
+    """
+    years = sorted(set(years))
+    if not years:
+        return
+    marks = ", ".join("?" * len(years))
+
+    cur.execute(f"""
+    DELETE FROM agg_station_year WHERE station_id = ? AND year IN ({marks})
+    """, (station_id, *years))
+    cur.execute(f"""
+    INSERT INTO agg_station_year
+    SELECT station_id, year, {_aggregate_select()}
+    FROM observations
+    WHERE station_id = ? AND year IN ({marks})
+    GROUP BY station_id, year
+    """, (station_id, *years))
+
+    cur.execute("DELETE FROM agg_station_month WHERE station_id = ?", (station_id,))
+    cur.execute(f"""
+    INSERT INTO agg_station_month
+    SELECT station_id, month, {_aggregate_select()}
+    FROM observations
+    WHERE station_id = ?
+    GROUP BY station_id, month
+    """, (station_id,))
+
+    cur.execute("DELETE FROM agg_station WHERE station_id = ?", (station_id,))
+    cur.execute(f"""
+    INSERT INTO agg_station
+    SELECT station_id, {_rollup_select()}
+    FROM agg_station_month
+    WHERE station_id = ?
+    GROUP BY station_id
+    """, (station_id,))
+
+    cur.execute(f"DELETE FROM agg_year WHERE year IN ({marks})", years)
+    cur.execute(f"""
+    INSERT INTO agg_year
+    SELECT year, {_rollup_select()}
+    FROM agg_station_year
+    WHERE year IN ({marks})
+    GROUP BY year
+    """, years)
+
+    cur.execute("DELETE FROM agg_month")
+    cur.execute(f"""
+    INSERT INTO agg_month
+    SELECT month, {_rollup_select()}
+    FROM agg_station_month
+    GROUP BY month
+    """)
+
+def _rebuild_aggregates(cur):
+    for table in AGGREGATE_TABLES:
+        cur.execute(f"DELETE FROM {table}")
+
+    cur.execute(f"""
+    INSERT INTO agg_station_year
+    SELECT station_id, year, {_aggregate_select()}
+    FROM observations
+    GROUP BY station_id, year
+    """)
+    cur.execute(f"""
+    INSERT INTO agg_station_month
+    SELECT station_id, month, {_aggregate_select()}
+    FROM observations
+    GROUP BY station_id, month
+    """)
+    cur.execute(f"""
+    INSERT INTO agg_station
+    SELECT station_id, {_rollup_select()}
+    FROM agg_station_month
+    GROUP BY station_id
+    """)
+    cur.execute(f"""
+    INSERT INTO agg_year
+    SELECT year, {_rollup_select()}
+    FROM agg_station_year
+    GROUP BY year
+    """)
+    cur.execute(f"""
+    INSERT INTO agg_month
+    SELECT month, {_rollup_select()}
+    FROM agg_station_month
+    GROUP BY month
+    """)
+
+def rebuild_aggregates():
+    """
+    Recomputes every summary table from the observations table.
+    """
+    with _writer_lock:
+        conn = get_writer()
+        _rebuild_aggregates(conn.cursor())
+        _bump_data_version(conn.cursor())
+        conn.commit()
+
+def refresh_aggregates(station_id, years):
+    """
+    Recomputes the summary rows for a station's observations in the given
+    years, after writes made with insert_observations(refresh=False).
+    """
+    with _writer_lock:
+        conn = get_writer()
+        cur = conn.cursor()
+        _refresh_aggregates(cur, station_id, years)
+        _bump_data_version(cur)
+        conn.commit()
 
 # Insert #
 def insert_station(name, lon, lat, opened, data_url):
-    conn = connect()
-    cur = conn.cursor()
+    with _writer_lock:
+        conn = get_writer()
+        cur = conn.cursor()
 
-    cur.execute("""
-    INSERT OR IGNORE INTO stations (name, lon, lat, opened, data_url)
-    VALUES (?, ?, ?, ?, ?)              
-    """, (name, lon, lat, opened, data_url))
+        cur.execute("""
+        INSERT OR IGNORE INTO stations (name, lon, lat, opened, data_url)
+        VALUES (?, ?, ?, ?, ?)              
+        """, (name, lon, lat, opened, data_url))
+        if cur.rowcount:
+            _bump_data_version(cur)
+            _bump_version(cur, 'stations_version')
 
-    cur.execute("SELECT id FROM stations WHERE name = ?", (name,))
+        cur.execute("SELECT id FROM stations WHERE name = ?", (name,))
 
-    station_id = cur.fetchone()[0]
+        station_id = cur.fetchone()[0]
 
-    conn.commit()
-    conn.close()
+        conn.commit()
 
     return station_id
 
 def insert_observation(station_id, year, month, tmax, tmin, af, rain, sun):
-    conn = connect()
-    cur = conn.cursor()
+    """
+    Inserts one observation through insert_observations(). Each call
+    refreshes the station's summary rows, so write many rows with
+    insert_observations() instead, which refreshes once per batch.
+    Returns 1, or None on error.
+    """
+    return insert_observations(station_id, [(year, month, tmax, tmin, af, rain, sun)])
 
-    cur.execute("""
-    INSERT OR REPLACE INTO observations
-        (station_id, year, month, tmax, tmin, af, rain, sun)
-    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    """, (station_id, year, month, tmax, tmin, af, rain, sun))
+def insert_observations(station_id, rows, refresh=True):
+    """
+    Inserts many observations for a station in a single transaction.
+    rows is an iterable of (year, month, tmax, tmin, af, rain, sun) tuples.
+    With refresh=False the summary tables are left for a later
+    refresh_aggregates() call, e.g. after several batches.
+    Returns the number of rows written, or None on error.
+    """
+    params = [(station_id, *row) for row in rows]
+
+    with _writer_lock, metrics.timer(WRITE_SECONDS, operation="insert_observations"):
+        conn = get_writer()
+        cur = conn.cursor()
+
+        try:
+            cur.executemany("""
+            INSERT OR REPLACE INTO observations
+                (station_id, year, month, tmax, tmin, af, rain, sun)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, params)
+            if params:
+                if refresh:
+                    _refresh_aggregates(cur, station_id, [row[1] for row in params])
+                _bump_data_version(cur)
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"Error inserting observations: {e}")
+            return None
+
+    WRITE_ROWS.inc(len(params), operation="insert_observations")
+    return len(params)
+
+def write_anomalies(stations, climatology, station_years, anomalies, inputs, input_keys,
+                    baseline, version, full=False):
+    """
+    Persists anomaly engine results in one transaction. Replaces:
+        climatology rows of stations with climatology
+            (station_id, month, then <metric>_mean, <metric>_n per metric)
+        anomalies rows of each (station_id, year) in station_years with anomalies
+            (station_id, year, month, <metric>...)
+        anomaly_inputs rows of each (station_id, year) in input_keys with inputs
+            (agg_station_year rows)
+    then the agg_anomaly rows of the years touched, and records the baseline
+    and data version. full=True replaces everything instead.
+    Returns the number of anomaly rows written, or None on error.
+    """
+    metric_marks = ", ".join("?" * len(AGGREGATE_METRICS))
+
+    with _writer_lock, metrics.timer(WRITE_SECONDS, operation="write_anomalies"):
+        conn = get_writer()
+        cur = conn.cursor()
+
+        try:
+            if full:
+                for table in ("climatology", "anomalies", *ANOMALY_TABLES):
+                    cur.execute(f"DELETE FROM {table}")
+            else:
+                cur.executemany("DELETE FROM climatology WHERE station_id = ?",
+                                [(station_id,) for station_id in stations])
+                cur.executemany("DELETE FROM anomalies WHERE station_id = ? AND year = ?", station_years)
+                cur.executemany("DELETE FROM anomaly_inputs WHERE station_id = ? AND year = ?", input_keys)
 
-    conn.commit()
-    conn.close()
+            cur.executemany(f"""
+            INSERT INTO climatology VALUES (?, ?, {metric_marks}, {metric_marks})
+            """, climatology)
+            cur.executemany(f"""
+            INSERT INTO anomalies VALUES (?, ?, ?, {metric_marks})
+            """, anomalies)
+            cur.executemany(f"""
+            INSERT INTO anomaly_inputs VALUES (?, ?, {metric_marks}, {metric_marks})
+            """, inputs)
+
+            sums = ", ".join(f"SUM({metric}), COUNT({metric})" for metric in AGGREGATE_METRICS)
+            if full:
+                cur.execute(f"""
+                INSERT INTO agg_anomaly
+                SELECT year, month, {sums}
+                FROM anomalies
+                GROUP BY year, month
+                """)
+            else:
+                years = sorted({year for _, year in station_years} | {year for _, year in input_keys})
+                for year in years:
+                    cur.execute("DELETE FROM agg_anomaly WHERE year = ?", (year,))
+                    cur.execute(f"""
+                    INSERT INTO agg_anomaly
+                    SELECT year, month, {sums}
+                    FROM anomalies
+                    WHERE year = ?
+                    GROUP BY year, month
+                    """, (year,))
+
+            cur.executemany("UPDATE metadata SET value = ? WHERE key = ?", [
+                (baseline[0], 'baseline_start'),
+                (baseline[1], 'baseline_end'),
+                (version, 'anomalies_version'),
+            ])
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"Error writing anomalies: {e}")
+            return None
+
+    WRITE_ROWS.inc(len(anomalies), operation="write_anomalies")
+    return len(anomalies)
+
+def set_station_file(station_id, etag, last_modified, content_hash):
+    with _writer_lock:
+        conn = get_writer()
+        cur = conn.cursor()
+
+        cur.execute("""
+        INSERT OR REPLACE INTO station_files
+            (station_id, etag, last_modified, content_hash, fetched_at)
+        VALUES (?, ?, ?, ?, datetime('now'))
+        """, (station_id, etag, last_modified, content_hash))
+
+        conn.commit()
+
+# Instrumentation #
+# Queries are labelled with the name their caller passes to select().
+# Queries slower than SLOW_QUERY_SECONDS (env SLOW_QUERY_SECONDS) are
+# printed with their SQL and parameters.
+SLOW_QUERY_SECONDS = float(os.environ.get("SLOW_QUERY_SECONDS", "0.25"))
+
+QUERY_SECONDS = metrics.Histogram(
+    "db_query_seconds", "Time spent executing and fetching select queries.", ["query"])
+QUERY_ROWS = metrics.Counter(
+    "db_query_rows_total", "Rows returned by select queries.", ["query"])
+QUERY_ERRORS = metrics.Counter(
+    "db_query_errors_total", "Select queries that raised a database error.", ["query"])
+WRITE_SECONDS = metrics.Histogram(
+    "db_write_seconds", "Time spent in observation write transactions.", ["operation"])
+WRITE_ROWS = metrics.Counter(
+    "db_write_rows_total", "Observation rows written.", ["operation"])
+
+def _log_slow_query(name, elapsed, rows, query, params):
+    if elapsed >= SLOW_QUERY_SECONDS:
+        print(f"Slow query in {name}: {elapsed * 1000:.1f}ms, {rows} rows\n"
+              f"    {' '.join(query.split())}\n    params: {params}")
 
 # Select
-def select(query: str, params: Tuple[Any, ...] = ()) -> Optional [List[Tuple]]:
-    conn = connect()
-    cur = conn.cursor()
+_query_log = None
+
+@contextmanager
+def capture_queries():
+    """
+    Records every (query, params) passed to select() inside the block.
+    """
+    global _query_log
+    _query_log = []
+    try:
+        yield _query_log
+    finally:
+        _query_log = None
+
+def select(query: str, params: Tuple[Any, ...] = (), name: str = "unnamed") -> Optional [List[Tuple]]:
+    """
+    Runs a query and returns its rows, or None on error. name labels the
+    query in the query metrics and slow query log.
+    """
+    if _query_log is not None:
+        _query_log.append((query, params))
+
+    cur = get_connection().cursor()
+    start = time.perf_counter()
 
     try:
         cur.execute(query, params)
 
         results = cur.fetchall()
 
+        elapsed = time.perf_counter() - start
+        QUERY_SECONDS.observe(elapsed, query=name)
+        QUERY_ROWS.inc(len(results), query=name)
+        _log_slow_query(name, elapsed, len(results), query, params)
+
         return results
     
     except sqlite3.Error as e:
+        QUERY_ERRORS.inc(query=name)
         print(f"Error performing database query: {e}")
         return None
     
     finally:
-        conn.close()
+        cur.close()
+
+def explain(query: str, params: Tuple[Any, ...] = ()) -> Optional [List[str]]:
+    """
+    Returns the EXPLAIN QUERY PLAN detail lines for a query.
+    """
+    data = select(f"EXPLAIN QUERY PLAN {query}", params, name="explain")
+
+    if data is None:
+        return None
+    return [row[3] for row in data]
 
 # General Queries #
 def get_station(station_id: int):
@@ -110,9 +646,79 @@ def get_station(station_id: int):
     """
     params = (station_id,)
 
-    data = select(query, params)
+    data = select(query, params, name="get_station")
     
     if data:
         return data[0]
     else:
-        return None
\ No newline at end of file
+        return None
+
+def get_version(key: str) -> int:
+    query = """
+    SELECT value FROM metadata WHERE key = ?;
+    """
+    params = (key,)
+
+    data = select(query, params, name="get_version")
+
+    if data:
+        return data[0][0]
+    else:
+        return 0
+
+def get_data_version() -> int:
+    """
+    Returns a counter that increases whenever stations or observations
+    are written, for keying caches of derived data.
+    """
+    return get_version('data_version')
+
+def get_database_id() -> int:
+    """
+    Returns the random id given to the database when it was created.
+    """
+    return get_version('database_id')
+
+def get_stations_version() -> int:
+    """
+    Returns a counter that increases whenever a station is added.
+    """
+    return get_version('stations_version')
+
+def get_station_files():
+    """
+    Returns {station_id: (etag, last_modified, content_hash)} for every
+    station file fetched by a previous scrape.
+    """
+    query = """
+    SELECT station_id, etag, last_modified, content_hash
+    FROM station_files;
+    """
+
+    data = select(query, name="get_station_files")
+
+    if data is None:
+        return {}
+    return {row[0]: row[1:] for row in data}
+
+def get_observation_rows(station_id: int, start_year: Optional[int] = None, end_year: Optional[int] = None):
+    """
+    Returns {(year, month): (year, month, tmax, tmin, af, rain, sun)}
+    for every stored observation of a station, optionally only between
+    start_year and end_year inclusive.
+    """
+    query = """
+    SELECT year, month, tmax, tmin, af, rain, sun
+    FROM observations
+    WHERE station_id = ? AND year BETWEEN ? AND ?;
+    """
+    params = (
+        station_id,
+        start_year if start_year is not None else -1,
+        end_year if end_year is not None else 9999)
+
+    data = select(query, params, name="get_observation_rows")
+
+    if data is None:
+        return {}
+    return {(row[0], row[1]): row for row in data}
@@ -0,0 +1,166 @@
+import threading
+import time
+from contextlib import contextmanager
+
+'''
+Minimal in-process metrics: counters, gauges and histograms with labels,
+rendered in the Prometheus text exposition format for the API's /metrics.
+
+Render workers run in separate processes, so their observations are
+captured (see capture()) and replayed into the API process's metrics.
+'''
+
+# Latency buckets in seconds, from sub-millisecond queries to slow renders
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_metrics = {}
+_capture = threading.local()
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}  # label values tuple -> value
+        self.lock = threading.Lock()
+        _metrics[name] = self
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _record(self, value, labels):
+        observations = getattr(_capture, "observations", None)
+        if observations is not None:
+            observations.append((self.name, value, labels))
+
+    def samples(self):
+        """
+        Yields (suffix, label pairs, value) for the exposition format.
+        """
+        with self.lock:
+            items = list(self.values.items())
+        for key, value in items:
+            yield "", tuple(zip(self.labelnames, key)), value
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        self._record(amount, labels)
+
+    observe = inc
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                # [count per bucket..., +Inf count, sum]
+                entry = self.values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+            entry[-2] += 1
+            entry[-1] += value
+        self._record(value, labels)
+
+    def totals(self, **labels):
+        """
+        Returns (count, sum) of the observations with these labels.
+        """
+        with self.lock:
+            entry = self.values.get(self._key(labels))
+            if entry is None:
+                return 0, 0.0
+            return entry[-2], entry[-1]
+
+    def samples(self):
+        with self.lock:
+            items = [(key, list(entry)) for key, entry in self.values.items()]
+        for key, entry in items:
+            labels = tuple(zip(self.labelnames, key))
+            for bound, count in zip(self.buckets, entry):
+                yield "_bucket", labels + (("le", repr(bound)),), count
+            yield "_bucket", labels + (("le", "+Inf"),), entry[-2]
+            yield "_count", labels, entry[-2]
+            yield "_sum", labels, entry[-1]
+
+@contextmanager
+def timer(histogram, **labels):
+    """
+    Observes the time spent in the block, in seconds.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start, **labels)
+
+@contextmanager
+def capture():
+    """
+    Collects every counter and histogram observation made by this thread
+    inside the block as (name, value, labels), for replay() in another process.
+    """
+    _capture.observations = []
+    try:
+        yield _capture.observations
+    finally:
+        _capture.observations = None
+
+def replay(observations):
+    for name, value, labels in observations:
+        metric = _metrics.get(name)
+        if metric is not None:
+            metric.observe(value, **labels)
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+def exposition():
+    """
+    Returns every metric in the Prometheus text format.
+    """
+    lines = []
+    for metric in list(_metrics.values()):
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for suffix, labels, value in metric.samples():
+            label_text = ",".join(f'{name}="{_escape(v)}"' for name, v in labels)
+            if label_text:
+                label_text = "{" + label_text + "}"
+            lines.append(f"{metric.name}{suffix}{label_text} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+def reset():
+    """
+    Clears every recorded value, keeping the metrics themselves.
+    """
+    for metric in list(_metrics.values()):
+        with metric.lock:
+            metric.values.clear()
@@ -0,0 +1,187 @@
+import src.database as db
+import src.analysis as analysis
+
+import os
+import json
+import time
+import hashlib
+import argparse
+from itertools import groupby
+
+'''
+Pre-renders every station graph and every overall/latitude graph across
+the render pool, so API visitors don't wait for matplotlib.
+
+    python -m src.render_all [--workers N] [--force]
+
+Each graph's inputs are the summary rows it is drawn from, hashed into a
+digest. Graphs whose digest matches the manifest (and whose files exist)
+are skipped and just marked current for the new data version. The manifest,
+GRAPH_OUTPUT_DIR/manifest.json, maps "plot/station_id" to the file(s), the
+inputs digest and the data version, and is what the API serves from.
+'''
+
+STATION_PLOTS = [
+    analysis.plot_station_temp_trend,
+    analysis.plot_station_monthly_rainfall,
+    analysis.plot_station_monthly_sunshine,
+]
+
+OVERALL_PLOTS = [
+    analysis.plot_overall_temp_trend,
+    analysis.plot_overall_rainfall_trend,
+    analysis.plot_overall_sunshine_trend,
+    analysis.plot_overall_monthly_temp,
+    analysis.plot_overall_monthly_rainfall,
+    analysis.plot_overall_monthly_sunshine,
+]
+
+LATITUDE_PLOTS = [
+    analysis.plot_lat_against,
+]
+
+def _digest(*parts):
+    return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+def station_digests():
+    """
+    Returns {station_id: digest} of each station's name and yearly and
+    monthly summary rows, which its graphs are drawn from.
+    """
+    names = db.select(
+        "SELECT id, name FROM stations ORDER BY id;", name="render_all.stations") or []
+    yearly = db.select(
+        "SELECT * FROM agg_station_year ORDER BY station_id, year;", name="render_all.station_years") or []
+    monthly = db.select(
+        "SELECT * FROM agg_station_month ORDER BY station_id, month;", name="render_all.station_months") or []
+
+    yearly = {k: list(g) for k, g in groupby(yearly, key=lambda row: row[0])}
+    monthly = {k: list(g) for k, g in groupby(monthly, key=lambda row: row[0])}
+
+    return {
+        station_id: _digest(name, yearly.get(station_id), monthly.get(station_id))
+        for station_id, name in names
+    }
+
+def overall_digest():
+    return _digest(
+        db.select("SELECT * FROM agg_year ORDER BY year;", name="render_all.years"),
+        db.select("SELECT * FROM agg_month ORDER BY month;", name="render_all.months"))
+
+def latitude_digest():
+    return _digest(
+        db.select("SELECT * FROM agg_station ORDER BY station_id;", name="render_all.station_averages"),
+        db.select("SELECT id, lat FROM stations ORDER BY id;", name="render_all.latitudes"))
+
+def manifest_path():
+    return os.path.join(analysis.GRAPH_OUTPUT_DIR, analysis.MANIFEST_FILE)
+
+def load_manifest():
+    try:
+        with open(manifest_path()) as f:
+            return json.load(f).get("entries", {})
+    except (OSError, ValueError):
+        return {}
+
+def write_manifest(entries, version, database_id):
+    path = manifest_path()
+    with open(f"{path}.tmp", "w") as f:
+        json.dump({"data_version": version, "database_id": database_id, "entries": entries}, f, indent=1)
+    os.replace(f"{path}.tmp", path)
+
+def _files_exist(files):
+    if isinstance(files, dict):
+        files = files.values()
+    else:
+        files = [files]
+    return all(os.path.exists(f) for f in files)
+
+def plan(force=False):
+    """
+    Works out which graphs need rendering.
+    Returns (version, database_id, jobs, entries): the data version and
+    database id, a list of (plot, args, digest) to render, and the new
+    manifest entries for every graph that is already up to date.
+    """
+    # Read the version first, so a scrape during the run leaves entries stale rather than wrong
+    version = db.get_data_version()
+    database_id = db.get_database_id()
+    previous = {} if force else load_manifest()
+
+    targets = []
+    for station_id, digest in station_digests().items():
+        for plot in STATION_PLOTS:
+            targets.append((plot, (station_id,), digest))
+    digest = overall_digest()
+    targets.extend((plot, (), digest) for plot in OVERALL_PLOTS)
+    digest = latitude_digest()
+    targets.extend((plot, (), digest) for plot in LATITUDE_PLOTS)
+
+    jobs = []
+    entries = {}
+    for plot, args, digest in targets:
+        key = analysis.manifest_key(plot.__name__, args)
+        entry = previous.get(key)
+        if entry and entry["inputs"] == digest and _files_exist(entry["files"]):
+            entries[key] = dict(entry, data_version=version, database_id=database_id)
+        else:
+            jobs.append((plot, args, digest))
+
+    return version, database_id, jobs, entries
+
+def render_all(force=False):
+    """
+    Renders every out-of-date graph and rewrites the manifest.
+    Returns (rendered, skipped, failed) counts.
+    """
+    version, database_id, jobs, entries = plan(force)
+    skipped = len(entries)
+    digests = {(plot, args): digest for plot, args, digest in jobs}
+
+    rendered = failed = 0
+    for (plot, args), result in analysis.render_batch((plot, args) for plot, args, _ in jobs):
+        if result is None:
+            failed += 1
+            continue
+        rendered += 1
+        entries[analysis.manifest_key(plot.__name__, args)] = {
+            "plot": plot.__name__,
+            "station_id": args[0] if args else None,
+            "files": result,
+            "inputs": digests[(plot, args)],
+            "data_version": version,
+            "database_id": database_id,
+        }
+
+    write_manifest(entries, version, database_id)
+    return rendered, skipped, failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-render every graph into the render manifest.")
+    parser.add_argument("--workers", type=int, default=analysis.RENDER_WORKERS,
+                        help="render processes (default: one per CPU)")
+    parser.add_argument("--force", action="store_true",
+                        help="re-render every graph, even if its inputs are unchanged")
+    args = parser.parse_args()
+
+    print("-"*60)
+    print("Rendering graphs...")
+    print("-"*60)
+
+    analysis.RENDER_WORKERS = args.workers
+    analysis.use_store()
+
+    start = time.perf_counter()
+    try:
+        rendered, skipped, failed = render_all(args.force)
+    finally:
+        analysis.shutdown_render_pool()
+        db.close_connections()
+    elapsed = time.perf_counter() - start
+
+    print(f"Rendered {rendered} graph(s) in {elapsed:.2f}s ({rendered / elapsed if elapsed else 0:.1f}/s)")
+    print(f"Skipped {skipped} unchanged graph(s)")
+    if failed:
+        print(f"{failed} graph(s) failed")
+    print(f"Manifest written to {manifest_path()}")
+    print("-"*60)
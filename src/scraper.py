@@ -1,39 +1,136 @@
 
 import src.database as db
+import src.metrics as metrics
+import src.store as store
+import src.anomalies as anomalies
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from bs4 import BeautifulSoup as bs
 
+import os
+import re
+import json
+import numpy as np
 import pandas as pd
 from io import StringIO
+import time
+import hashlib
+import shutil
+import tempfile
+import argparse
+import threading
+from urllib.parse import urlparse, urljoin
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Historic station data
 HISTORIC_STATION_DATA_URL = 'https://www.metoffice.gov.uk/research/climate/maps-and-data/historic-station-data'
 
+OBSERVATION_COLUMNS = ["year", "month", "tmax", "tmin", "af", "rain", "sun"]
+_MARKERS = str.maketrans("", "", "*#")
+_TRAILING_NOTE = re.compile(r"[A-Za-z][^\n]*")
+# A data line's first seven fields, and anything after them
+_EXTRA_FIELDS = re.compile(r"^([ \t]*(?:\S+[ \t]+){6}\S+)[^\n]*", flags=re.MULTILINE)
+
+# Fetch settings
+MAX_WORKERS = 8             # concurrent station downloads
+MIN_REQUEST_INTERVAL = 0.2  # seconds between requests to the same host
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5        # retries wait 0.5s, 1s, 2s, ...
+REQUEST_TIMEOUT = 30
+
+# Streaming settings
+STREAM_CHUNK_BYTES = 64 * 1024  # bytes read from a response or file at a time
+WRITE_BATCH_ROWS = 1200         # observations per write transaction (100 years)
+SPOOL_MAX_BYTES = 1024 * 1024   # bytes of a file held in memory while hashing, before spilling to disk
+
+# Recorded corpus layout (see --record / --replay): the index page, a
+# manifest mapping each station's original data link to its file name,
+# and the station files themselves
+CORPUS_INDEX = "index.html"
+CORPUS_MANIFEST = "manifest.json"
+
+# Per-stage timings: fetch and parse run on the worker threads,
+# clean and write on the main thread
+STAGES = ("fetch", "parse", "clean", "write")
+STAGE_SECONDS = metrics.Histogram(
+    "scrape_stage_seconds", "Time spent in each scraper stage per station.", ["stage"])
+
 # --- Scrapping ---
-def get_soup(url):
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        print(f"Successful Request to {url}")
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching: {e}")
-    
-    return bs(response.text, 'html.parser')
+class RateLimiter:
+    """
+    Spaces out requests to the same host by at least min_interval seconds.
+    Safe to share between worker threads.
+    """
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self.lock = threading.Lock()
+        self.next_slot = {}
+
+    def wait(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+_session = None
+_session_lock = threading.Lock()
+_rate_limiter = RateLimiter(MIN_REQUEST_INTERVAL)
+
+def get_session():
+    """
+    Returns the shared requests.Session, pooling connections for the
+    worker threads and retrying failed requests with exponential backoff.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=MAX_RETRIES,
+                backoff_factor=BACKOFF_FACTOR,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=("GET",))
+            adapter = HTTPAdapter(
+                pool_connections=MAX_WORKERS,
+                pool_maxsize=MAX_WORKERS,
+                max_retries=retry)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+    return _session
+
+def fetch(url, headers=None, stream=False):
+    _rate_limiter.wait(url)
+    response = get_session().get(url, headers=headers, timeout=REQUEST_TIMEOUT, stream=stream)
+    response.raise_for_status()
+    return response
 
 def get_text(url):
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        text = response.text
+        text = fetch(url).text
     except requests.exceptions.RequestException as e:
         print(f"Error fetching text: {e}")
+        return None
 
     return text
 
-def extract_historic_station_table_data():
-    soup = get_soup(HISTORIC_STATION_DATA_URL)
+def get_index_html(source=None):
+    """
+    Returns the historic station data index page, from the live site or
+    from a recorded corpus directory or URL. None on error.
+    """
+    if source is None:
+        return get_text(HISTORIC_STATION_DATA_URL)
+    return read_corpus_file(source, CORPUS_INDEX)
+
+def parse_station_table(html):
+    soup = bs(html, 'html.parser') if html is not None else None
 
     try:
         table = soup.find("table")
@@ -58,8 +155,11 @@ def extract_historic_station_table_data():
 
     return headers, rows
 
-def extract_station_data(url):
-    lines = get_text(url).splitlines()
+def extract_historic_station_table_data(source=None):
+    return parse_station_table(get_index_html(source))
+
+def parse_station_text(text, url=""):
+    lines = text.splitlines()
 
     # Find header "yyyy mm ..."
     header_idx = None
@@ -69,7 +169,7 @@ def extract_station_data(url):
             break
     if header_idx is None:
         print(f"Failed to find header in {url} file.")
-        exit()
+        return None
     
     header_line = lines[header_idx]
     units_line = lines[header_idx + 1]
@@ -99,6 +199,69 @@ def extract_station_data(url):
 
     return df, units_line
 
+def parse_station_columns(text):
+    """
+    Parses a station data file into a typed DataFrame with columns
+    year, month, tmax, tmin, af, rain, sun. Missing values ('---') are NaN/NA
+    and '*'/'#' markers are stripped. The data block is cleaned with
+    whole-text operations and parsed by pandas' C reader in one pass,
+    rather than cleaning each value in Python.
+    Returns None if the "yyyy mm ..." header is not found.
+    """
+    header = re.search(r"^[ \t]*yyyy\b.*$", text, flags=re.MULTILINE)
+    if header is None:
+        return None
+
+    # Skip the header and the units line below it
+    units_end = text.find("\n", header.end() + 1)
+    body = text[units_end + 1:] if units_end != -1 else ""
+
+    # Data ends at the first line that doesn't start with a year, e.g. 'Site Closed'
+    end = re.search(r"^[ \t]*(?!\d{4}(?:\s|$))\S", body, flags=re.MULTILINE)
+    if end is not None:
+        body = body[:end.start()]
+
+    return parse_data_block(body)
+
+def parse_data_block(body):
+    """
+    Parses data lines (no header, units or trailing text) of a station
+    file into the typed DataFrame described in parse_station_columns.
+    """
+    # Drop '*'/'#' markers and trailing notes such as 'Provisional', then
+    # anything left after the seventh field, e.g. the '(' of '(provisional)'
+    body = body.translate(_MARKERS)
+    body = _TRAILING_NOTE.sub("", body)
+    body = _EXTRA_FIELDS.sub(r"\1", body)
+
+    df = pd.read_csv(
+        StringIO(body), sep=r"\s+", header=None, names=OBSERVATION_COLUMNS,
+        na_values=["---"], engine="c")
+    for column in OBSERVATION_COLUMNS:
+        if df[column].dtype != float:
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype(float)
+
+    af = df["af"].to_numpy()
+    df["af"] = pd.array(np.where(af == np.round(af), af, np.nan), dtype="Int16")
+
+    # Drop rows without a valid month
+    df = df[df["month"].between(1, 12)].copy()
+    df["year"] = df["year"].astype(np.int16)
+    df["month"] = df["month"].astype(np.int8)
+
+    return df.reset_index(drop=True)
+
+def observation_rows(df):
+    """
+    Returns the rows of a parse_station_columns DataFrame as
+    (year, month, tmax, tmin, af, rain, sun) tuples, with None for missing.
+    """
+    columns = [
+        df[column].to_numpy(dtype=object, na_value=None)
+        for column in OBSERVATION_COLUMNS
+    ]
+    return list(zip(*columns))
+
 # --- Parsing ---
 def parse_location(loc_str):
     lon, lat = [s.strip() for s in loc_str.split(",")]
@@ -135,13 +298,357 @@ def clean_number(x, type):
     else:
         print("Invalid type for clean_number funciton.")
 
+def clean_observations(df):
+    """
+    Returns the rows of a parsed station DataFrame as cleaned
+    (year, month, tmax, tmin, af, rain, sun) tuples.
+    """
+    rows = []
+    for obs in df.itertuples(index=False):
+        year = clean_number(getattr(obs, 'yyyy'), "int")
+        month = clean_number(getattr(obs, 'mm'), "int")
+        af = clean_number(getattr(obs, "af"), "int")
+
+        tmax = clean_number(getattr(obs, "tmax"), "float")
+        tmin = clean_number(getattr(obs, "tmin"), "float")
+        rain = clean_number(getattr(obs, "rain"), "float")
+        sun = clean_number(getattr(obs, "sun"), "float")
+
+        rows.append((year, month, tmax, tmin, af, rain, sun))
+    return rows
+
+def changed_rows(station_id, rows):
+    """
+    Returns only the rows that are new or differ from those already
+    stored for the station.
+    """
+    if not rows:
+        return rows
+    years = [row[0] for row in rows]
+    existing = db.get_observation_rows(station_id, min(years), max(years))
+    return [row for row in rows if existing.get((row[0], row[1])) != row]
+
+# --- Streaming ---
+# Station files are streamed from the response straight into the database:
+# byte chunks -> lines -> observation tuples -> batches of WRITE_BATCH_ROWS,
+# each written in its own transaction. Only one chunk and one batch are held
+# at a time, so memory doesn't grow with the length of a station's record.
+def open_station_file(location, file_info=None):
+    """
+    Opens a station file (URL or local path) for streaming, sending the
+    stored validators as a conditional request.
+    Returns (chunks, etag, last_modified), with chunks None if the file is
+    unchanged, or None on error. chunks must be closed when done.
+    """
+    etag, last_modified, _ = file_info or (None, None, None)
+
+    if not is_remote(location):
+        try:
+            f = open(location, "rb")
+        except OSError as e:
+            print(f"Error reading {location}: {e}")
+            return None
+        return _file_chunks(f), None, None
+
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    try:
+        response = fetch(location, headers, stream=True)
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching text: {e}")
+        return None
+
+    if response.status_code == 304:
+        response.close()
+        return None, etag, last_modified
+
+    return (_response_chunks(response),
+            response.headers.get("ETag"), response.headers.get("Last-Modified"))
+
+def _file_chunks(f):
+    with f:
+        while chunk := f.read(STREAM_CHUNK_BYTES):
+            yield chunk
+
+def _response_chunks(response):
+    with response:
+        yield from response.iter_content(STREAM_CHUNK_BYTES)
+
+def iter_lines(chunks, hasher=None, out=None, timings=None):
+    """
+    Yields decoded lines from an iterable of byte chunks. The raw bytes
+    are also fed to hasher and written to out if given, and the time spent
+    waiting for chunks is added to timings["fetch"].
+    """
+    remainder = b""
+    chunks = iter(chunks)
+    while True:
+        start = time.perf_counter()
+        chunk = next(chunks, None)
+        if timings is not None:
+            timings["fetch"] += time.perf_counter() - start
+        if chunk is None:
+            break
+
+        if hasher is not None:
+            hasher.update(chunk)
+        if out is not None:
+            out.write(chunk)
+
+        lines = (remainder + chunk).split(b"\n")
+        remainder = lines.pop()
+        for line in lines:
+            yield line.decode("utf-8", errors="replace")
+
+    if remainder:
+        yield remainder.decode("utf-8", errors="replace")
+
+def spool_chunks(chunks, timings=None):
+    """
+    Copies an iterable of byte chunks into a temporary file, hashing them
+    on the way, and closes it, adding the time taken to timings["fetch"].
+    Only the first SPOOL_MAX_BYTES are kept in memory; the rest spills
+    to disk. Returns (spool, sha256 hex digest) with the spool rewound,
+    or None on error.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    hasher = hashlib.sha256()
+    start = time.perf_counter()
+    try:
+        for chunk in chunks:
+            hasher.update(chunk)
+            spool.write(chunk)
+    except (OSError, requests.exceptions.RequestException) as e:
+        print(f"Error reading station file: {e}")
+        spool.close()
+        return None
+    finally:
+        chunks.close()
+        if timings is not None:
+            timings["fetch"] += time.perf_counter() - start
+
+    spool.seek(0)
+    return spool, hasher.hexdigest()
+
+def stream_observations(lines, block_rows=WRITE_BATCH_ROWS):
+    """
+    Yields (year, month, tmax, tmin, af, rain, sun) tuples from the lines
+    of a station file. Data lines are gathered into blocks of block_rows
+    and each block is parsed with parse_data_block, so values are cleaned
+    exactly as in parse_station_columns.
+    Raises ValueError if the "yyyy mm ..." header is not found.
+    """
+    lines = iter(lines)
+    for line in lines:
+        if line.strip().startswith("yyyy"):
+            next(lines, None)  # units line
+            break
+    else:
+        raise ValueError("header not found")
+
+    block = []
+    for line in lines:
+        fields = line.split(None, 1)
+        if not fields:
+            continue
+
+        # Data ends at the first line that doesn't start with a year, e.g. 'Site Closed'
+        if not (len(fields[0]) == 4 and fields[0].isdigit()):
+            break
+
+        block.append(line)
+        if len(block) == block_rows:
+            yield from observation_rows(parse_data_block("\n".join(block)))
+            block = []
+
+    if block:
+        yield from observation_rows(parse_data_block("\n".join(block)))
+
+def batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def stream_station_data(station_id, location, file_info=None, full=False, save_to=None):
+    """
+    Streams a station file into the database in batches of WRITE_BATCH_ROWS.
+    Unless full is set, only new or changed months are written.
+    file_info is the (etag, last_modified, content_hash) stored by the
+    previous scrape, if any. If save_to is given the file is also saved there.
+    Returns (rows written, file_info), with rows None if the file is
+    unchanged, or None on failure (rows already written are kept, and the
+    file is re-read next run as its file_info isn't updated).
+    Summary tables are refreshed once, after the last batch.
+    A file with a stored content hash is first hashed while it's spooled
+    to a temporary file (see spool_chunks), so an unchanged one is skipped
+    without any per-row work and a changed one is parsed from the spool.
+    """
+    start = time.perf_counter()
+    opened = open_station_file(location, file_info)
+    request_time = time.perf_counter() - start
+    if opened is None:
+        return None
+    chunks, etag, last_modified = opened
+    if chunks is None:
+        STAGE_SECONDS.observe(request_time, stage="fetch")
+        return None, file_info
+
+    # Stages are interleaved, so time each one across the whole stream
+    timings = {"fetch": 0.0, "parse": 0.0, "clean": 0.0, "write": 0.0}
+
+    _, _, stored_hash = file_info or (None, None, None)
+    content_hash = None
+    if stored_hash and not full:
+        spooled = spool_chunks(chunks, timings)
+        if spooled is None:
+            return None
+        spool, content_hash = spooled
+        if content_hash == stored_hash:
+            with spool:
+                if save_to:
+                    with open(save_to, "wb") as f:
+                        shutil.copyfileobj(spool, f, STREAM_CHUNK_BYTES)
+            STAGE_SECONDS.observe(request_time + timings["fetch"], stage="fetch")
+            return None, (etag, last_modified, content_hash)
+        chunks = _file_chunks(spool)
+
+    hasher = hashlib.sha256() if content_hash is None else None
+    out = open(save_to, "wb") if save_to else None
+    written = 0
+    years = set()
+    try:
+        rows = stream_observations(iter_lines(chunks, hasher, out, timings))
+
+        start = time.perf_counter()
+        for batch in batched(rows, WRITE_BATCH_ROWS):
+            pulled = time.perf_counter()
+            timings["parse"] += pulled - start
+
+            if not full:
+                batch = changed_rows(station_id, batch)
+            cleaned = time.perf_counter()
+            timings["clean"] += cleaned - pulled
+
+            if batch:
+                inserted = db.insert_observations(station_id, batch, refresh=False)
+                if inserted is None:
+                    return None
+                written += inserted
+                years.update(row[0] for row in batch)
+            start = time.perf_counter()
+            timings["write"] += start - cleaned
+    except (ValueError, OSError, requests.exceptions.RequestException) as e:
+        print(f"Failed to read {location}: {e}")
+        return None
+    finally:
+        chunks.close()
+        if out is not None:
+            out.close()
+        if years:
+            start = time.perf_counter()
+            db.refresh_aggregates(station_id, years)
+            timings["write"] += time.perf_counter() - start
+        # Waiting on the network happens while pulling rows, so isn't parse time
+        timings["parse"] -= timings["fetch"]
+        timings["fetch"] += request_time
+        for stage, seconds in timings.items():
+            STAGE_SECONDS.observe(max(seconds, 0.0), stage=stage)
+
+    new_info = (etag, last_modified, content_hash or hasher.hexdigest())
+    if new_info[2] == stored_hash and written == 0:
+        return None, new_info
+    return written, new_info
+
+# --- Corpus ---
+def is_remote(location):
+    return urlparse(location).scheme in ("http", "https")
+
+def corpus_location(corpus, file_name):
+    """
+    Returns the path or URL of a file in a corpus directory or URL.
+    """
+    if is_remote(corpus):
+        return urljoin(corpus.rstrip("/") + "/", file_name)
+    return os.path.join(corpus, file_name)
+
+def read_corpus_file(corpus, file_name):
+    location = corpus_location(corpus, file_name)
+    if is_remote(location):
+        return get_text(location)
+
+    try:
+        with open(location) as f:
+            return f.read()
+    except OSError as e:
+        print(f"Error reading {location}: {e}")
+        return None
+
+def load_corpus_manifest(corpus):
+    """
+    Returns {original data link: file name} for a recorded corpus, or None.
+    """
+    text = read_corpus_file(corpus, CORPUS_MANIFEST)
+    if text is None:
+        return None
+    return json.loads(text)
+
+def corpus_file_names(links):
+    """
+    Returns {link: file name}, named after each link's last path segment.
+    """
+    names = {}
+    used = set()
+    for i, link in enumerate(links):
+        name = os.path.basename(urlparse(link).path) or "station.txt"
+        if name in used:
+            name = f"{i}_{name}"
+        used.add(name)
+        names[link] = name
+    return names
+
+def write_corpus_index(directory, html, manifest):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, CORPUS_INDEX), "w") as f:
+        f.write(html)
+    with open(os.path.join(directory, CORPUS_MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=1)
+
+def print_stage_timings():
+    print("Stage timings (fetch and parse are summed across worker threads):")
+    for stage in STAGES:
+        count, total = STAGE_SECONDS.totals(stage=stage)
+        each = total / count * 1000 if count else 0
+        print(f"  {stage:<6}{total:8.2f}s  {count:>5} stations  ({each:.1f}ms each)")
+
 
 # --- SCRAPER ---
 if __name__ == "__main__":
     """
     Retrieves Data from met office website, cleans it, then stores it in 
     a local sqlite3 database file.
+    Only station files that changed since the last run are downloaded,
+    and only new or changed months are written, unless --full is given.
+    --record saves the index page and station files to a local corpus,
+    which --replay can later ingest from (as a directory or served over HTTP).
     """
+    parser = argparse.ArgumentParser(description="Scrape Met Office historic station data.")
+    parser.add_argument("--full", action="store_true",
+                        help="re-download and re-insert every station file")
+    parser.add_argument("--record", metavar="DIR",
+                        help="also save the index page and every station file to a corpus in DIR")
+    parser.add_argument("--replay", metavar="CORPUS",
+                        help="ingest from a recorded corpus directory, or its URL on a local HTTP server")
+    args = parser.parse_args()
+
     print("-"*60)
     print("Beginning...")
     print("-"*60)
@@ -149,10 +656,25 @@ if __name__ == "__main__":
     # Create tables if not already created
     db.create_tables()
 
-    headers, stations = extract_historic_station_table_data()
+    html = get_index_html(args.replay)
+    headers, stations = parse_station_table(html)
+
+    manifest = {}
+    if args.replay:
+        manifest = load_corpus_manifest(args.replay)
+        if manifest is None:
+            print(f"Failed to read corpus manifest from {args.replay}.")
+            exit()
+        # No need to be polite to a local stand-in server
+        _rate_limiter.min_interval = 0
+
+    record_names = {}
+    if args.record:
+        record_names = corpus_file_names([station[3] for station in stations])
+        write_corpus_index(args.record, html, record_names)
 
-    station_data = []
     # Insert stations
+    station_ids = {}
     for station in stations:
 
         name = station[0]
@@ -160,25 +682,85 @@ if __name__ == "__main__":
         opened = station[2]
         link = station[3]
 
-        station_id = db.insert_station(name, lon, lat, opened, link)
-
-        df, _ = extract_station_data(link)
-
-        # Insert observations
-        for obs in df.itertuples(index=False):
-            year = clean_number(getattr(obs, 'yyyy'), "int")
-            month = clean_number(getattr(obs, 'mm'), "int")
-            af = clean_number(getattr(obs, "af"), "int")
-
-            tmax = clean_number(getattr(obs, "tmax"), "float")
-            tmin = clean_number(getattr(obs, "tmin"), "float")
-            rain = clean_number(getattr(obs, "rain"), "float")
-            sun = clean_number(getattr(obs, "sun"), "float")
-            
-            db.insert_observation(station_id, year, month, tmax, tmin, af, rain, sun)
-        
-        print(f"Inserted {len(df)}\tobservations for {name}")
+        station_ids[name] = db.insert_station(name, lon, lat, opened, link)
+
+    # Recording needs every file, so skip the conditional requests
+    file_infos = {} if args.full or args.record else db.get_station_files()
+
+    total_rows = 0
+    unchanged = []
+    failed = []
+    start = time.perf_counter()
+    # Stream station files concurrently, each worker writing its
+    # station's observations in batches as they are parsed
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        futures = {}
+        for station in stations:
+            name, link = station[0], station[3]
+            file_info = file_infos.get(station_ids[name])
+
+            location = link
+            if args.replay:
+                if link not in manifest:
+                    print(f"{name} is not in the corpus.")
+                    failed.append(name)
+                    continue
+                location = corpus_location(args.replay, manifest[link])
+            save_to = os.path.join(args.record, record_names[link]) if args.record else None
+
+            futures[pool.submit(
+                stream_station_data, station_ids[name], location, file_info, args.full, save_to)] = name
+
+        for future in as_completed(futures):
+            name = futures[future]
+            station_id = station_ids[name]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Error processing {name}: {e}")
+                result = None
+
+            if result is None:
+                failed.append(name)
+                continue
+            inserted, file_info = result
+
+            if inserted is None:
+                unchanged.append(name)
+                db.set_station_file(station_id, *file_info)
+                continue
+
+            total_rows += inserted
+            db.set_station_file(station_id, *file_info)
+
+            print(f"Inserted {inserted}\tobservations for {name}")
+
+    elapsed = time.perf_counter() - start
+
+    # Columnar snapshot for fast analysis loading
+    snapshot_start = time.perf_counter()
+    snapshot = store.export_snapshot()
+    if snapshot is not None:
+        print(f"Snapshot {snapshot} up to date ({time.perf_counter() - snapshot_start:.2f}s)")
+
+    # Anomalies of the station years written by this run
+    anomalies_start = time.perf_counter()
+    anomaly_rows = anomalies.update_anomalies()
+    if anomaly_rows is not None:
+        print(f"Updated {anomaly_rows} anomalies ({time.perf_counter() - anomalies_start:.2f}s)")
+    db.close_connections()
 
     print("-"*60)
     print("Finished inserting data.")
+    rate = total_rows / elapsed if elapsed else 0
+    station_rate = len(stations) / elapsed if elapsed else 0
+    print(f"{total_rows} observations in {elapsed:.2f}s ({rate:.0f} rows/s)")
+    print(f"{len(stations)} stations in {elapsed:.2f}s ({station_rate:.1f} stations/s)")
+    print_stage_timings()
+    if args.record:
+        print(f"Recorded corpus to {args.record}")
+    if unchanged:
+        print(f"{len(unchanged)} station(s) unchanged since last run")
+    if failed:
+        print(f"{len(failed)} station(s) failed: {', '.join(sorted(failed))}")
     print("-"*60)
\ No newline at end of file
@@ -0,0 +1,233 @@
+import math
+
+import numpy as np
+
+'''
+Spatial index over station coordinates, for finding stations near a
+location by great-circle distance.
+
+Stations are bucketed into a regular lat/lon grid, sorted by cell, so the
+stations of a run of cells along one grid row are a contiguous slice. A
+radius query only measures the stations in cells overlapping the circle's
+bounding box; a nearest-k query runs radius queries of doubling size until
+k stations are found, which is exact as every station outside the radius
+is further than those inside it.
+
+idw_grid() interpolates station values onto a regular lat/lon grid by
+inverse distance weighting, for the climate maps. The grid is split into
+tiles and each tile only measures the stations a radius query of the index
+finds within range of it, rather than every station.
+'''
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Cells are sized for about this many stations each
+STATIONS_PER_CELL = 4
+MIN_CELL_DEGREES = 0.01
+
+# lat_min, lat_max, lon_min, lon_max of the UK
+UK_BOUNDS = (49.8, 60.9, -8.2, 1.8)
+
+# Inverse distance weighting: weights are distance ** -IDW_POWER, stations
+# further than IDW_MAX_DISTANCE_KM are ignored, and grid points with none
+# in range are NaN
+IDW_POWER = 2
+IDW_MAX_DISTANCE_KM = 150.0
+# Closer than this, a grid point takes a station's value
+IDW_MIN_DISTANCE_KM = 0.001
+# Grid points x stations per block of distances, bounding memory use
+IDW_BLOCK_SIZE = 2 ** 21
+# Size of the tiles of grid points that share one radius query
+IDW_TILE_DEGREES = 1.0
+
+def haversine_km(lat, lon, lats, lons):
+    """
+    Great-circle distances in km from (lat, lon) to arrays of points, all in degrees.
+    """
+    lat, lon = math.radians(lat), math.radians(lon)
+    lats, lons = np.radians(lats), np.radians(lons)
+    a = (np.sin((lats - lat) / 2) ** 2
+         + math.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+class StationIndex:
+    """
+    Grid index of station ids by coordinates. Queries return
+    (ids, distances in km) arrays, nearest first.
+    """
+    def __init__(self, ids, lats, lons):
+        ids = np.asarray(ids, dtype=np.int64)
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+
+        if len(ids):
+            self.lat0, self.lon0 = lats.min(), lons.min()
+            height, width = lats.max() - self.lat0, lons.max() - self.lon0
+            self.cell = max(math.sqrt(max(height * width, MIN_CELL_DEGREES ** 2) * STATIONS_PER_CELL / len(ids)),
+                            MIN_CELL_DEGREES)
+        else:
+            self.lat0 = self.lon0 = height = width = 0.0
+            self.cell = 1.0
+        self.rows = int(height // self.cell) + 1
+        self.cols = int(width // self.cell) + 1
+
+        rows, cols = self._cells(lats, lons)
+        cells = rows * self.cols + cols
+        order = np.argsort(cells, kind='stable')
+        self.ids = ids[order]
+        self.lats = lats[order]
+        self.lons = lons[order]
+        # Stations in cell c are [starts[c], starts[c + 1])
+        self.starts = np.searchsorted(cells[order], np.arange(self.rows * self.cols + 1))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _cells(self, lats, lons):
+        rows = np.clip(((lats - self.lat0) // self.cell).astype(np.int64), 0, self.rows - 1)
+        cols = np.clip(((lons - self.lon0) // self.cell).astype(np.int64), 0, self.cols - 1)
+        return rows, cols
+
+    def _candidates(self, lat, lon, radius_km):
+        """
+        Returns positions of the stations in cells overlapping the bounding
+        box of a circle.
+        """
+        dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+        widest = min(abs(lat) + dlat, 90.0)
+        if widest >= 89.9:
+            dlon = 360.0
+        else:
+            dlon = dlat / math.cos(math.radians(widest))
+
+        row0 = max(int((lat - dlat - self.lat0) // self.cell), 0)
+        row1 = min(int((lat + dlat - self.lat0) // self.cell), self.rows - 1)
+        if dlon >= 180.0 or lon - dlon < -180.0 or lon + dlon > 180.0:
+            # Wraps around the antimeridian: take every column
+            col0, col1 = 0, self.cols - 1
+        else:
+            col0 = max(int((lon - dlon - self.lon0) // self.cell), 0)
+            col1 = min(int((lon + dlon - self.lon0) // self.cell), self.cols - 1)
+        if row0 > row1 or col0 > col1:
+            return np.empty(0, dtype=np.int64)
+
+        slices = [
+            np.arange(self.starts[row * self.cols + col0], self.starts[row * self.cols + col1 + 1])
+            for row in range(row0, row1 + 1)
+        ]
+        return np.concatenate(slices)
+
+    def within(self, lat, lon, radius_km, limit=None):
+        """
+        Returns the stations within radius_km of (lat, lon), at most limit of them.
+        """
+        positions = self._candidates(lat, lon, radius_km)
+        distances = haversine_km(lat, lon, self.lats[positions], self.lons[positions])
+        inside = distances <= radius_km
+        positions, distances = positions[inside], distances[inside]
+
+        order = np.argsort(distances, kind='stable')[:limit]
+        return self.ids[positions[order]], distances[order]
+
+    def nearest(self, lat, lon, k=1):
+        """
+        Returns the k stations nearest to (lat, lon).
+        """
+        k = min(k, len(self))
+        if k <= 0:
+            return self.ids[:0], np.empty(0)
+
+        radius = self.cell * 111.0
+        while radius < math.pi * EARTH_RADIUS_KM:
+            ids, distances = self.within(lat, lon, radius, k)
+            if len(ids) == k:
+                return ids, distances
+            radius *= 2
+        return self.within(lat, lon, math.pi * EARTH_RADIUS_KM, k)
+
+def grid_axes(bounds=UK_BOUNDS, resolution=0.1):
+    """
+    Returns the (lats, lons) of a regular grid's points, resolution degrees apart.
+    """
+    lat_min, lat_max, lon_min, lon_max = bounds
+    lats = lat_min + resolution * np.arange(int(round((lat_max - lat_min) / resolution)) + 1)
+    lons = lon_min + resolution * np.arange(int(round((lon_max - lon_min) / resolution)) + 1)
+    return lats, lons
+
+def idw_grid(lats, lons, values, bounds=UK_BOUNDS, resolution=0.1,
+             power=IDW_POWER, max_distance_km=IDW_MAX_DISTANCE_KM):
+    """
+    Interpolates station values onto a regular grid by inverse distance
+    weighting of great-circle distances. Each IDW_TILE_DEGREES tile of
+    grid points only measures the stations a StationIndex radius query
+    finds in range of it, so the cost grows with the stations near each
+    point rather than all of them.
+    Returns (grid_lats, grid_lons, grid), with grid a float32 array of
+    shape (len(grid_lats), len(grid_lons)).
+    """
+    grid_lats, grid_lons = grid_axes(bounds, resolution)
+    grid = np.full((len(grid_lats), len(grid_lons)), np.nan, dtype=np.float32)
+
+    lats, lons, values = (np.asarray(a, dtype=float) for a in (lats, lons, values))
+    valid = ~(np.isnan(lats) | np.isnan(lons) | np.isnan(values))
+    lats, lons, values = lats[valid], lons[valid], values[valid]
+    if len(values) == 0:
+        return grid_lats, grid_lons, grid
+
+    # Without a distance limit every station weighs on every grid point, and
+    # a grid small enough for one block of distances isn't worth tiling
+    if max_distance_km is None or grid.size * len(values) <= IDW_BLOCK_SIZE:
+        grid[:] = _idw_block(grid_lats, grid_lons, lats, lons, values, power, max_distance_km)
+        return grid_lats, grid_lons, grid
+
+    # Index ids are positions in the value arrays
+    index = StationIndex(np.arange(len(values)), lats, lons)
+    tile = max(1, int(round(IDW_TILE_DEGREES / resolution)))
+    for row in range(0, len(grid_lats), tile):
+        tile_lats = grid_lats[row:row + tile]
+        lat = tile_lats.mean()
+        # Stations in range of any point of a tile are within range plus
+        # the tile's reach of its centre. Edge tiles are narrower, so the
+        # reach of a full one covers them too.
+        offsets = resolution * (np.arange(min(tile, len(grid_lons))) - (min(tile, len(grid_lons)) - 1) / 2)
+        reach = haversine_km(lat, 0.0, *np.meshgrid(tile_lats, offsets, indexing="ij")).max()
+
+        for col in range(0, len(grid_lons), tile):
+            tile_lons = grid_lons[col:col + tile]
+            positions, _ = index.within(lat, tile_lons.mean(), max_distance_km + reach)
+            if len(positions):
+                grid[row:row + tile, col:col + tile] = _idw_block(
+                    tile_lats, tile_lons, lats[positions], lons[positions], values[positions],
+                    power, max_distance_km)
+
+    return grid_lats, grid_lons, grid
+
+def _idw_block(grid_lats, grid_lons, lats, lons, values, power, max_distance_km):
+    """
+    Inverse distance weighted values at every point of a grid from every
+    given station, as a (len(grid_lats), len(grid_lons)) array.
+    """
+    block = np.empty((len(grid_lats), len(grid_lons)))
+
+    # The haversine term sin²(Δφ/2) + cos φ cos φs sin²(Δλ/2) splits into
+    # per-row and per-column parts, each computed once per station
+    phi, phi_s = np.radians(grid_lats)[:, None], np.radians(lats)[None, :]
+    row_terms = np.sin((phi_s - phi) / 2) ** 2
+    row_scales = np.cos(phi) * np.cos(phi_s)
+    col_terms = np.sin((np.radians(lons)[None, :] - np.radians(grid_lons)[:, None]) / 2) ** 2
+
+    step = max(1, IDW_BLOCK_SIZE // (len(grid_lons) * len(values)))
+    for start in range(0, len(grid_lats), step):
+        rows = slice(start, start + step)
+        a = row_terms[rows, None, :] + row_scales[rows, None, :] * col_terms[None, :, :]
+        distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+        weights = np.maximum(distances, IDW_MIN_DISTANCE_KM) ** -power
+        if max_distance_km is not None:
+            weights[distances > max_distance_km] = 0
+
+        totals = weights.sum(axis=2)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            block[rows] = np.where(totals > 0, (weights @ values) / totals, np.nan)
+
+    return block
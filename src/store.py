@@ -0,0 +1,343 @@
+import os
+import json
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+import src.database as db
+
+try:
+    import pyarrow  # optional, for Parquet copies of snapshots
+except ImportError:
+    pyarrow = None
+
+'''
+In-memory, columnar copy of the observations table for the analysis layer.
+
+Rows are sorted by (station_id, year, month), so each station's rows are a
+contiguous slice found through an offsets array. Keys are compact ints and
+metrics float32, with NaN for missing values. "temp" is the derived monthly
+mean temperature (tmax + tmin) / 2.
+
+A store can be saved as a snapshot of .npy files (see save()), which
+open() memory-maps without copying, so loading takes milliseconds rather
+than a full read of the observations table. The scraper exports one
+after every run; SNAPSHOT_DIR/CURRENT names the latest version's directory.
+A snapshot records the database id as well as the data version, since a
+new database starts counting versions again.
+'''
+
+METRICS = ["tmax", "tmin", "temp", "af", "rain", "sun"]
+SNAPSHOT_DIR = "snapshot"
+
+class ObservationStore:
+    def __init__(self, version, station_id, year, month, values, stations, index=None, database_id=None):
+        # Arrays already of the right type (e.g. memory-mapped) aren't copied
+        self.version = version
+        self.database_id = database_id
+        self.columns = {
+            "station_id": station_id.astype(np.int32, copy=False),
+            "year": year.astype(np.int16, copy=False),
+            "month": month.astype(np.int8, copy=False),
+        }
+        for metric in METRICS:
+            self.columns[metric] = values[metric].astype(np.float32, copy=False)
+
+        # Station offsets: rows of station_ids[i] are offsets[i]:offsets[i + 1]
+        if index is None:
+            self.station_ids, starts = np.unique(self.columns["station_id"], return_index=True)
+            self.offsets = np.append(starts, len(station_id))
+        else:
+            self.station_ids, self.offsets = index
+
+        # Station details, indexed like stations table ids
+        self.stations = stations
+
+    def __len__(self):
+        return len(self.columns["station_id"])
+
+    @classmethod
+    def load(cls):
+        """
+        Reads the whole observations and stations tables into a new store.
+        """
+        version = db.get_data_version()
+        database_id = db.get_database_id()
+
+        query = """
+        SELECT station_id, year, month, tmax, tmin, af, rain, sun
+        FROM observations
+        ORDER BY station_id, year, month;
+        """
+        data = db.select(query, name="store.observations")
+        if data is None:
+            return None
+        rows = np.array(data, dtype=float).reshape(-1, 8)
+
+        values = {
+            "tmax": rows[:, 3],
+            "tmin": rows[:, 4],
+            "af": rows[:, 5],
+            "rain": rows[:, 6],
+            "sun": rows[:, 7],
+        }
+        values["temp"] = (values["tmax"] + values["tmin"]) / 2.0
+
+        query = """
+        SELECT id, name, lon, lat FROM stations ORDER BY id;
+        """
+        data = db.select(query, name="store.stations")
+        if data is None:
+            return None
+        stations = pd.DataFrame(data, columns=["id", "name", "lon", "lat"]).set_index("id")
+
+        return cls(version, rows[:, 0], rows[:, 1], rows[:, 2], values, stations,
+                   database_id=database_id)
+
+    def frame(self):
+        """
+        Returns the observations as a DataFrame over the store's arrays.
+        """
+        return pd.DataFrame(self.columns, copy=False)
+
+    def save(self, directory=SNAPSHOT_DIR):
+        """
+        Writes the store as a snapshot in directory/v<version>: one .npy
+        file per column, plus Parquet copies of the observations and
+        stations if pyarrow is installed. Then points directory/CURRENT at
+        it and removes older versions. Returns the snapshot's path.
+        """
+        name = f"v{self.version}"
+        path = os.path.join(directory, name)
+        building = f"{path}.tmp{os.getpid()}"
+        shutil.rmtree(building, ignore_errors=True)
+        os.makedirs(building)
+
+        arrays = dict(self.columns)
+        arrays["station_ids"] = self.station_ids
+        arrays["offsets"] = self.offsets
+        arrays["stations_id"] = self.stations.index.to_numpy(dtype=np.int32)
+        arrays["stations_lon"] = self.stations["lon"].to_numpy(dtype=float)
+        arrays["stations_lat"] = self.stations["lat"].to_numpy(dtype=float)
+        arrays["stations_name"] = self.stations["name"].to_numpy(dtype=str)
+        for key, array in arrays.items():
+            np.save(os.path.join(building, f"{key}.npy"), np.asarray(array))
+
+        if pyarrow is not None:
+            self.frame().to_parquet(os.path.join(building, "observations.parquet"))
+            self.stations.reset_index().to_parquet(os.path.join(building, "stations.parquet"))
+
+        with open(os.path.join(building, "meta.json"), "w") as f:
+            json.dump({"version": self.version, "database_id": self.database_id, "rows": len(self)}, f)
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.rename(building, path)
+
+        # Switch readers over atomically, then drop older versions. Open
+        # memory maps of removed files stay valid until they're closed.
+        current = os.path.join(directory, "CURRENT")
+        with open(f"{current}.tmp", "w") as f:
+            f.write(name)
+        os.replace(f"{current}.tmp", current)
+        for entry in os.listdir(directory):
+            if entry.startswith("v") and entry != name:
+                shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+
+        return path
+
+    @classmethod
+    def open(cls, directory=SNAPSHOT_DIR, version=None, database_id=None):
+        """
+        Memory-maps the current snapshot in directory. Returns None if there
+        is no snapshot, or it isn't of the given data version and database.
+        """
+        path = snapshot_path(directory)
+        if path is None:
+            return None
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                meta = json.load(f)
+            if version is not None and (meta["version"], meta.get("database_id")) != (version, database_id):
+                return None
+
+            def load(key):
+                return np.load(os.path.join(path, f"{key}.npy"), mmap_mode="r")
+
+            stations = pd.DataFrame({
+                "id": load("stations_id"),
+                "name": load("stations_name"),
+                "lon": load("stations_lon"),
+                "lat": load("stations_lat"),
+            }).set_index("id")
+
+            return cls(
+                meta["version"], load("station_id"), load("year"), load("month"),
+                {metric: load(metric) for metric in METRICS}, stations,
+                index=(load("station_ids"), load("offsets")), database_id=meta.get("database_id"))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error opening snapshot {path}: {e}")
+            return None
+
+    def station_rows(self, station_id):
+        """
+        Returns the slice of rows belonging to a station (empty if unknown).
+        """
+        i = np.searchsorted(self.station_ids, station_id)
+        if i == len(self.station_ids) or self.station_ids[i] != station_id:
+            return slice(0, 0)
+        return slice(self.offsets[i], self.offsets[i + 1])
+
+    def group_means(self, key, metrics, station_id=None):
+        """
+        Vectorized equivalent of
+            SELECT key, AVG(metric), ... GROUP BY key ORDER BY key
+        over all rows, or one station's rows. Returns a DataFrame with the
+        key column and an avg_<metric> column per metric.
+        """
+        rows = self.station_rows(station_id) if station_id is not None else slice(None)
+        keys = self.columns[key][rows].astype(np.int64)
+        if len(keys) == 0:
+            return pd.DataFrame(columns=[key] + [f"avg_{m}" for m in metrics])
+
+        # Keys are small ints, so bin them directly rather than sorting
+        base = keys.min()
+        bins = keys - base
+        present = np.bincount(bins) > 0
+
+        out = {key: (np.flatnonzero(present) + base)}
+        for metric in metrics:
+            out[f"avg_{metric}"] = _binned_mean(bins, self.columns[metric][rows], len(present))[present]
+        return pd.DataFrame(out)
+
+    def mean(self, metric, station_id=None):
+        """
+        Mean of a metric over all rows or one station's rows, or None.
+        """
+        rows = self.station_rows(station_id) if station_id is not None else slice(None)
+        values = self.columns[metric][rows]
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return None
+        return float(values.mean(dtype=np.float64))
+
+    def station_statistic(self, metric, statistic, start_year=None, end_year=None, months=None):
+        """
+        Vectorized equivalent of
+            SELECT station_id, AVG|SUM|MAX(metric) ... GROUP BY station_id
+        for statistic "mean", "total" or "max", optionally over a range of
+        years and/or a set of months. Returns (station_ids, values), without
+        stations that have no values in the window.
+        """
+        values = self.columns[metric].astype(np.float64)
+        valid = ~np.isnan(values)
+        if start_year is not None:
+            valid &= self.columns["year"] >= start_year
+        if end_year is not None:
+            valid &= self.columns["year"] <= end_year
+        if months:
+            valid &= np.isin(self.columns["month"], months)
+        if len(values) == 0:
+            return self.station_ids[:0], values
+
+        # Each station's rows are contiguous, so reduce over their offsets
+        starts = self.offsets[:-1]
+        counts = np.add.reduceat(valid.astype(np.int64), starts)
+        if statistic == "max":
+            result = np.maximum.reduceat(np.where(valid, values, -np.inf), starts)
+        else:
+            result = np.add.reduceat(np.where(valid, values, 0.0), starts)
+            if statistic == "mean":
+                result = result / np.maximum(counts, 1)
+        present = counts > 0
+        return self.station_ids[present], result[present]
+
+    def station_year_means(self, metric, months=None):
+        """
+        Every station's yearly means of a metric, optionally over a set of
+        months only. Returns (station_ids, years, means), with means of
+        shape (stations, years) and NaN for years without values.
+        """
+        years = self.columns["year"].astype(np.int64)
+        if len(years) == 0:
+            return self.station_ids, years, np.empty((len(self.station_ids), 0))
+        first = years.min()
+        span = years.max() - first + 1
+
+        values = self.columns[metric]
+        if months:
+            values = np.where(np.isin(self.columns["month"], months), values, np.nan)
+
+        # Bin by (station, year), with stations numbered by their offsets
+        stations = np.repeat(np.arange(len(self.station_ids)), np.diff(self.offsets))
+        bins = stations * span + (years - first)
+        means = _binned_mean(bins, values, len(self.station_ids) * span)
+        return self.station_ids, np.arange(first, first + span), means.reshape(len(self.station_ids), span)
+
+def _binned_mean(bins, values, length):
+    valid = ~np.isnan(values)
+    sums = np.bincount(bins[valid], weights=values[valid], minlength=length)
+    counts = np.bincount(bins[valid], minlength=length)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+def snapshot_path(directory=SNAPSHOT_DIR):
+    """
+    Returns the path of the current snapshot in directory, or None.
+    """
+    try:
+        with open(os.path.join(directory, "CURRENT")) as f:
+            name = f.read().strip()
+    except OSError:
+        return None
+    return os.path.join(directory, name)
+
+def export_snapshot(directory=SNAPSHOT_DIR):
+    """
+    Writes a snapshot of the database to directory, unless the current one
+    is already of this database's latest data version. Returns its path, or
+    None on error.
+    """
+    version = db.get_data_version()
+    existing = ObservationStore.open(directory, version, db.get_database_id())
+    if existing is not None:
+        return snapshot_path(directory)
+
+    store = ObservationStore.load()
+    if store is None:
+        return None
+    return store.save(directory)
+
+_store = None
+_store_pinned = False
+_store_lock = threading.Lock()
+
+def get_store():
+    """
+    Returns the shared store, reloading it if the data version or database
+    has changed since it was loaded. Loads from the snapshot when it's up to date.
+    """
+    global _store
+    version = db.get_data_version()
+    database_id = db.get_database_id()
+    with _store_lock:
+        current = _store is not None and (_store.version, _store.database_id) == (version, database_id)
+        if _store is None or (not current and not _store_pinned):
+            store = ObservationStore.open(version=version, database_id=database_id) or ObservationStore.load()
+            if store is not None:
+                _store = store
+        return _store
+
+def set_store(store, pinned=False):
+    """
+    Replaces the shared store. A pinned store is kept even after the
+    database changes, e.g. to analyse a snapshot on its own.
+    """
+    global _store, _store_pinned
+    with _store_lock:
+        _store = store
+        _store_pinned = pinned
+
+def clear_store():
+    set_store(None)
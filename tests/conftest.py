@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+import src.database as db
+import src.store as store
+import src.analysis as analysis
+import src.metrics as metrics
+from benchmarks import synthetic
+
+STATIONS = 3
+YEARS = 60
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+@pytest.fixture
+def stations():
+    return synthetic.make_stations(STATIONS, YEARS)
+
+@pytest.fixture
+def database(tmp_path, monkeypatch, stations):
+    """
+    A fresh database of synthetic stations, with the working directory,
+    graphs and snapshots in tmp_path. Returns the corpus directory.
+    """
+    monkeypatch.chdir(tmp_path)
+    db.close_connections()
+    monkeypatch.setattr(db, "DATABASE_NAME", str(tmp_path / "test"))
+    monkeypatch.setattr(analysis, "GRAPH_OUTPUT_DIR", str(tmp_path / "graphs"))
+    os.makedirs(analysis.GRAPH_OUTPUT_DIR)
+
+    corpus = str(tmp_path / "corpus")
+    synthetic.write_corpus(corpus, stations, synthetic.generate_texts(stations))
+    synthetic.build_database(stations, corpus)
+    store.clear_store()
+    analysis.invalidate_station_registry()
+
+    yield corpus
+
+    store.clear_store()
+    analysis.invalidate_station_registry()
+    db.close_connections()
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import src.database as db
+import src.analysis as analysis
+
+def test_station_registry(database, stations):
+    listed = analysis.list_stations()
+    assert [station.name for station in listed] == [station[0] for station in stations]
+
+    station = analysis.get_station_by_name(stations[0][0])
+    assert analysis.get_station(station.id) is station
+    assert (station.lon, station.lat) == stations[0][1:3]
+    assert analysis.get_station(-1) is None
+
+def observation_frame():
+    rows = db.select("SELECT station_id, year, month, tmax, tmin, af, rain, sun FROM observations;")
+    frame = pd.DataFrame(rows, columns=["station_id", "year", "month", "tmax", "tmin", "af", "rain", "sun"])
+    frame["temp"] = (frame["tmax"] + frame["tmin"]) / 2.0
+    return frame
+
+@pytest.mark.parametrize("statistic", ["mean", "total", "max"])
+@pytest.mark.parametrize("window", [
+    {},
+    {"start_year": 1961, "end_year": 1990},
+    {"months": [12, 1, 2]},
+    {"start_year": 1961, "months": [6, 7, 8]},
+])
+def test_rank_stations(database, statistic, window):
+    frame = observation_frame()
+    if "start_year" in window:
+        frame = frame[frame["year"] >= window["start_year"]]
+    if "end_year" in window:
+        frame = frame[frame["year"] <= window["end_year"]]
+    if "months" in window:
+        frame = frame[frame["month"].isin(window["months"])]
+    expected = frame.groupby("station_id")["rain"].agg({"mean": "mean", "total": "sum", "max": "max"}[statistic])
+
+    ranking = analysis.rank_stations("rain", statistic, **window)
+    assert [station.id for station, _ in ranking] == expected.sort_values(ascending=False, kind="stable").index.tolist()
+    assert [value for _, value in ranking] == pytest.approx(expected.sort_values(ascending=False).tolist(), rel=1e-5)
+
+    assert len(analysis.rank_stations("rain", statistic, top=2, **window)) == 2
+    with pytest.raises(ValueError):
+        analysis.rank_stations("rain", statistic, top=0, **window)
+
+def test_fit_trends_matches_least_squares():
+    rng = np.random.default_rng(0)
+    x = np.arange(1900, 1960)
+    y = 0.02 * (x - 1900) + rng.normal(0, 0.5, size=(4, len(x)))
+    y[1, ::3] = np.nan
+    y[2, 5:] = np.nan
+
+    fits = analysis.fit_trends(x, y, min_points=10)
+    for series, slope, intercept in zip(y[:2], fits["slope"], fits["intercept"]):
+        mask = ~np.isnan(series)
+        expected = np.polyfit(x[mask], series[mask], 1)
+        assert (slope, intercept) == pytest.approx(tuple(expected))
+    assert np.isnan(fits["slope"][2])
+    assert fits["n"].tolist() == [60, 40, 5, 60]
+
+@pytest.mark.parametrize("window", [
+    {},
+    {"start_year": 1961, "end_year": 1990},
+    {"months": [12, 1, 2]},
+    {"start_year": 1961, "months": [6, 7, 8]},
+])
+def test_rank_stations_trend(database, window):
+    frame = observation_frame()
+    if "start_year" in window:
+        frame = frame[frame["year"] >= window["start_year"]]
+    if "end_year" in window:
+        frame = frame[frame["year"] <= window["end_year"]]
+    if "months" in window:
+        frame = frame[frame["month"].isin(window["months"])]
+    yearly = frame.groupby(["station_id", "year"])["temp"].mean().dropna()
+    expected = {
+        station_id: 100 * np.polyfit(series.index.get_level_values("year"), series.to_numpy(), 1)[0]
+        for station_id, series in yearly.groupby(level="station_id")
+    }
+
+    ranking = analysis.rank_stations("temp", "trend", **window)
+    assert {station.id: value for station, value in ranking} == pytest.approx(expected)
+    if not window:
+        assert ranking == [(station, trend["slope"]) for station, trend in analysis.rank_trends("temp")]
+
+def test_explain_queries(database, capsys):
+    analysis.explain_queries()
+    output = capsys.readouterr().out
+    assert "FROM anomalies" in output and "FROM agg_station_year ORDER BY station_id, year" in output
+    assert output.rstrip().endswith("0 full scan(s) of observations")
@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+import src.database as db
+import src.anomalies as anomalies
+from benchmarks import synthetic
+
+AGGREGATE_TABLES = list(db.AGGREGATE_TABLES)
+ANOMALY_TABLES = ["climatology", "anomalies", "agg_anomaly"]
+
+def read_tables(tables):
+    return {table: sorted(db.select(f"SELECT * FROM {table};"), key=repr) for table in tables}
+
+def edit_station_file(path):
+    """
+    Changes the tmax and rain of a station file's first and last months.
+    """
+    with open(path) as f:
+        lines = f.readlines()
+    data = [i for i, line in enumerate(lines) if line.split()[:1] and line.split()[0].isdigit()]
+    for i in (data[0], data[-1]):
+        fields = lines[i].split()[:7]
+        fields[2] = "25.5"
+        fields[5] = "321.0"
+        lines[i] = "   ".join(fields) + "\n"
+    with open(path, "w") as f:
+        f.writelines(lines)
+
+def test_incremental_update_matches_rebuild(database, stations):
+    anomalies.update_anomalies()
+
+    # Replay a corpus with months changed in and out of the baseline
+    for name, *_ in stations:
+        edit_station_file(os.path.join(database, synthetic.file_name(name)))
+    assert synthetic.build_database(stations, database) == 2 * len(stations)
+    assert anomalies.update_anomalies() > 0
+    incremental = read_tables(AGGREGATE_TABLES + ANOMALY_TABLES)
+
+    db.rebuild_aggregates()
+    anomalies.update_anomalies(full=True)
+    rebuilt = read_tables(AGGREGATE_TABLES + ANOMALY_TABLES)
+
+    for table in AGGREGATE_TABLES + ANOMALY_TABLES:
+        assert len(incremental[table]) == len(rebuilt[table]), table
+        for row, expected in zip(incremental[table], rebuilt[table]):
+            assert row == pytest.approx(expected), table
@@ -0,0 +1,49 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import src.api as api
+import src.analysis as analysis
+import src.anomalies as anomalies
+
+@pytest.fixture
+def client(database):
+    with TestClient(api.app) as client:
+        yield client
+    analysis.use_store(False)
+
+@pytest.fixture
+def station_id(client):
+    return client.get("/stations").json()["stations"][0]["id"]
+
+@pytest.mark.parametrize("series", ["temp_trend", "monthly", "anomalies"])
+def test_station_data(client, station_id, series):
+    response = client.get(f"/data/station/{station_id}/{series}")
+    assert response.status_code == 200
+    columns = [values for values in response.json().values() if isinstance(values, list)]
+    assert columns and all(columns)
+
+    cached = client.get(f"/data/station/{station_id}/{series}",
+                        headers={"If-None-Match": response.headers["ETag"]})
+    assert cached.status_code == 304
+
+@pytest.mark.parametrize("series", ["temp_trend", "monthly", "anomalies"])
+def test_station_data_not_found(client, series):
+    response = client.get(f"/data/station/999999/{series}")
+    assert response.status_code == 404
+    assert response.json() == {"error": "Station not found."}
+
+def test_rankings_top(client):
+    response = client.get("/rankings", params={"metric": "rain", "top": 2})
+    assert [row["rank"] for row in response.json()["rankings"]] == [1, 2]
+    assert client.get("/rankings", params={"top": -1}).status_code == 422
+
+@pytest.mark.parametrize("path", ["/data/station/1/anomalies", "/data/overall/anomalies"])
+def test_anomaly_etag_follows_baseline(client, path):
+    response = client.get(path)
+    assert response.json()["baseline"] == list(anomalies.BASELINE)
+
+    anomalies.update_anomalies(baseline=(1991, 2020))
+    changed = client.get(path, headers={"If-None-Match": response.headers["ETag"]})
+    assert changed.status_code == 200
+    assert changed.json()["baseline"] == [1991, 2020]
+    assert changed.headers["ETag"] != response.headers["ETag"]
@@ -0,0 +1,21 @@
+import src.database as db
+import src.store as store
+import src.analysis as analysis
+
+def query_rows():
+    return {key[0]: value for key, value in db.QUERY_ROWS.values.items()}
+
+def test_queries_are_labelled_by_name(database, stations):
+    store.ObservationStore.load()
+    analysis.StationRegistry.load()
+    analysis.StationTrends.load()
+
+    rows = query_rows()
+    assert rows["store.observations"] == db.select("SELECT COUNT(*) FROM observations")[0][0]
+    assert rows["store.stations"] == rows["registry.stations"] == len(stations)
+    assert rows["trends.station_years"] > 0
+    assert "load" not in rows
+
+def test_select_error(database):
+    assert db.select("SELECT * FROM missing_table", name="test.missing") is None
+    assert db.QUERY_ERRORS.values == {("test.missing",): 1}
@@ -0,0 +1,87 @@
+import os
+
+import src.scraper as scraper
+from benchmarks import synthetic
+
+HEADER = """Testville
+Location: Lat 52.000 Lon -1.000, 100 metres amsl
+   yyyy  mm   tmax    tmin      af    rain     sun
+              degC    degC    days      mm   hours
+"""
+
+def station_text(*lines):
+    return HEADER + "\n".join(lines) + "\n"
+
+EXPECTED = [
+    (1948, 1, 6.3, -0.9, 9, 204.8, 5.0),
+    (1948, 2, 6.8, -0.4, 7, 173.6, 22.6),
+    (1948, 3, 10.1, 3.0, 0, 180.1, 37.7),
+]
+
+def parse(text):
+    return scraper.observation_rows(scraper.parse_station_columns(text))
+
+def stream(text, block_rows=scraper.WRITE_BATCH_ROWS):
+    return list(scraper.stream_observations(text.splitlines(), block_rows))
+
+def test_parses_station_file():
+    text = station_text(
+        "   1948   1     6.3    -0.9       9   204.8     5.0",
+        "   1948   2     6.8*   -0.4       7   173.6    22.6#",
+        "   1948   3    10.1     3.0       0   180.1    37.7  Provisional",
+        "Site Closed",
+    )
+    assert parse(text) == EXPECTED
+    assert stream(text) == EXPECTED
+
+def test_extra_field_on_first_line():
+    # An eighth field on a block's first line used to shift every column
+    text = station_text(
+        "   1948   1     6.3    -0.9       9   204.8     5.0    12",
+        "   1948   2     6.8    -0.4       7   173.6    22.6",
+        "   1948   3    10.1     3.0       0   180.1    37.7",
+    )
+    assert parse(text) == EXPECTED
+    assert stream(text) == EXPECTED
+    assert stream(text, block_rows=1) == EXPECTED
+
+def test_extra_field_on_later_line():
+    # Notes not starting with a letter used to leave an eighth field behind
+    text = station_text(
+        "   1948   1     6.3    -0.9       9   204.8     5.0",
+        "   1948   2     6.8    -0.4       7   173.6    22.6  (provisional)",
+        "   1948   3    10.1     3.0       0   180.1    37.7  12 34",
+    )
+    assert parse(text) == EXPECTED
+    assert stream(text) == EXPECTED
+
+def test_missing_values():
+    text = station_text(
+        "   1948   1     6.3    -0.9     ---   204.8     ---",
+    )
+    assert parse(text) == [(1948, 1, 6.3, -0.9, None, 204.8, None)]
+
+def test_stream_station_data_spools_hashed_file(database, stations, tmp_path, monkeypatch):
+    # Spill to disk, to cover a spool larger than its memory limit
+    monkeypatch.setattr(scraper, "SPOOL_MAX_BYTES", 1024)
+    location = os.path.join(database, synthetic.file_name(stations[0][0]))
+    with open(location) as f:
+        original = f.read()
+
+    _, file_info = scraper.stream_station_data(1, location)
+    saved = str(tmp_path / "saved")
+    assert scraper.stream_station_data(1, location, file_info, save_to=saved) == (None, file_info)
+    with open(saved) as f:
+        assert f.read() == original
+
+    # Change one month's tmax
+    lines = original.splitlines(keepends=True)
+    i = next(i for i, line in enumerate(lines) if line.split()[:1] and line.split()[0].isdigit())
+    fields = lines[i].split()
+    lines[i] = "   ".join(fields[:2] + ["99.9"] + fields[3:7]) + "\n"
+    with open(location, "w") as f:
+        f.writelines(lines)
+
+    written, changed_info = scraper.stream_station_data(1, location, file_info)
+    assert written == 1
+    assert changed_info[2] != file_info[2]
@@ -0,0 +1,44 @@
+import pytest
+import numpy as np
+
+import src.database as db
+import src.store as store
+from benchmarks import synthetic
+
+def test_load_matches_database(database):
+    observations = store.ObservationStore.load()
+    assert len(observations) == db.select("SELECT COUNT(*) FROM observations")[0][0]
+    rain = db.select("SELECT AVG(rain) FROM observations")[0][0]
+    assert np.nanmean(observations.columns["rain"]) == pytest.approx(rain, rel=1e-5)
+    assert observations.database_id == db.get_database_id()
+
+def test_snapshot_round_trip(database):
+    version, database_id = db.get_data_version(), db.get_database_id()
+    path = store.export_snapshot()
+    assert path == store.snapshot_path()
+
+    snapshot = store.ObservationStore.open(version=version, database_id=database_id)
+    assert snapshot is not None
+    loaded = store.ObservationStore.load()
+    for column, values in loaded.columns.items():
+        np.testing.assert_array_equal(snapshot.columns[column], values)
+
+    # Up to date, so not written again
+    assert store.export_snapshot() == path
+    assert store.ObservationStore.open(version=version + 1, database_id=database_id) is None
+
+def test_snapshot_of_another_database(database, stations, tmp_path, monkeypatch):
+    store.export_snapshot()
+    version, database_id = db.get_data_version(), db.get_database_id()
+
+    # A new database of the same data reaches the same data version
+    db.close_connections()
+    monkeypatch.setattr(db, "DATABASE_NAME", str(tmp_path / "other"))
+    synthetic.build_database(stations, database)
+    assert db.get_data_version() == version
+    assert db.get_database_id() != database_id
+
+    assert store.ObservationStore.open(version=version, database_id=db.get_database_id()) is None
+    assert store.get_store().database_id == db.get_database_id()
+    store.export_snapshot()
+    assert store.ObservationStore.open(version=version, database_id=db.get_database_id()) is not None